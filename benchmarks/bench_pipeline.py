@@ -0,0 +1,213 @@
+"""Time every stage of the export pipeline on synthetic storyboard sheets.
+
+    python benchmarks/bench_pipeline.py [--quick] [--sheet 4x6@8000 ...] [--repeat 3] [--out results.json]
+
+Each sheet is generated by benchmarks/synthetic.py, written as a JPEG and
+then run through the same steps as the app's load and export: decode,
+upscale, adjust, display tiles, corner canonicalization, warp (which
+includes scaling to the output resolution), preview thumbnails and JPEG
+encode. Stages are timed separately (best of --repeat runs) along with
+the peak memory each one allocates, and the results are printed as JSON so
+runs before and after a change can be diffed.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from storyapp import engine, geometry  # noqa: E402
+from storyapp.tiles import TilePyramid, fit_view  # noqa: E402
+from synthetic import make_sheet  # noqa: E402
+
+# (rows, cols, width) of the default sheets, smallest first; --quick runs the first two
+DEFAULT_SHEETS = ((3, 3, 3000), (4, 4, 6000), (5, 6, 10000), (6, 8, 15000))
+
+# Canvas the sheet is fitted into for display, about the app's default window
+DISPLAY_SIZE = (1600, 900)
+
+# Same height as the app's preview strip
+THUMBNAIL_HEIGHT = 120
+
+# A typical adjustment stack: one brightness/contrast/saturation step
+ADJUSTMENTS = [engine.adjustment_step(10, 1.2, 0.9)]
+
+STAGES = ("decode", "upscale", "adjust", "display_tiles", "canonicalize", "warp", "thumbnail", "encode")
+
+
+def parse_sheet(text):
+    """Parse a ROWSxCOLS@WIDTH sheet spec"""
+    try:
+        grid, width = text.split("@")
+        rows, cols = grid.lower().split("x")
+        return int(rows), int(cols), int(width)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Expected ROWSxCOLS@WIDTH, got {text!r}")
+
+
+def measure(work, repeat):
+    """Run work() repeat times; returns (its last result, stage stats)"""
+    runs = []
+    peak = 0
+    for _ in range(repeat):
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        result = work()
+        runs.append(time.perf_counter() - start)
+        peak = max(peak, tracemalloc.get_traced_memory()[1] - before)
+        if len(runs) < repeat:
+            del result
+    return result, {"seconds": round(min(runs), 6), "runs": [round(r, 6) for r in runs],
+                    "peak_mb": round(peak / 2**20, 1)}
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, where the platform reports it"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (2**20 if sys.platform == "darwin" else 2**10), 1)
+
+
+def bench_sheet(rows, cols, width, args, scratch):
+    """Generate one sheet and time each pipeline stage on it"""
+    sheet, boxes = make_sheet(rows, cols, width, seed=args.seed)
+    path = os.path.join(scratch, f"sheet_{rows}x{cols}_{width}.jpg")
+    engine.write_panel(path, sheet)
+    height = sheet.shape[0]
+    del sheet
+
+    upscale_width = max(args.upscale_width, width)
+    scale = upscale_width / width
+    # Corners arrive in click order, not canonical order
+    rng = np.random.default_rng(args.seed)
+    clicks = np.array([box[rng.permutation(4)] for box in boxes]) * scale
+    stages = {}
+
+    img, stages["decode"] = measure(lambda: engine.load_image(path), args.repeat)
+    image, stages["upscale"] = measure(lambda: engine.upscale_image(img, upscale_width), args.repeat)
+    del img
+
+    def display_tiles():
+        # Build the pyramid and render the first screenful, fitted, as the app does on load
+        pyramid = TilePyramid(image)
+        zoom, offset = fit_view(image.shape, DISPLAY_SIZE)
+        return [pyramid.render(key, zoom, ADJUSTMENTS)
+                for key, _ in pyramid.visible_tiles(zoom, offset, DISPLAY_SIZE)]
+
+    _, stages["display_tiles"] = measure(display_tiles, args.repeat)
+
+    def canonicalize():
+        quads = geometry.canonical_quads(clicks)
+        geometry.quad_problems(quads)
+        return np.round(quads).astype(np.int32)
+
+    quads, stages["canonicalize"] = measure(canonicalize, args.repeat)
+
+    # Adjust and warp are one call in extract_panel; split here so each has its own time
+    regions = [engine.panel_region(box, image.shape) for box in quads]
+
+    def adjust():
+        return [engine.apply_adjustments(image[y0:y1, x0:x1], ADJUSTMENTS)
+                for x0, y0, x1, y1 in regions]
+
+    adjusted, stages["adjust"] = measure(adjust, args.repeat)
+
+    def warp():
+        # The resolution resize is folded into this warp (see panel_transforms)
+        return [engine.warp_panel(region, box - (x0, y0), args.resolution)
+                for region, box, (x0, y0, _, _) in zip(adjusted, quads, regions)]
+
+    panels, stages["warp"] = measure(warp, args.repeat)
+    del adjusted, image
+
+    def thumbnail():
+        return [engine.thumbnail(panel, THUMBNAIL_HEIGHT) for panel in panels]
+
+    _, stages["thumbnail"] = measure(thumbnail, args.repeat)
+
+    params = [cv2.IMWRITE_JPEG_QUALITY, engine.JPEG_QUALITY]
+
+    def encode():
+        return sum(len(cv2.imencode(".jpg", panel, params)[1]) for panel in panels)
+
+    encoded, stages["encode"] = measure(encode, args.repeat)
+    os.remove(path)
+
+    return {
+        "grid": f"{rows}x{cols}",
+        "width": width,
+        "height": height,
+        "panels": len(boxes),
+        "upscale_width": upscale_width,
+        "panel_size": list(panels[0].shape[1::-1]),
+        "encoded_mb": round(encoded / 2**20, 2),
+        "stages": {name: stages[name] for name in STAGES},
+        "total_seconds": round(sum(stage["seconds"] for stage in stages.values()), 6),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sheet", type=parse_sheet, action="append", metavar="ROWSxCOLS@WIDTH",
+                        help="Sheet to generate (repeatable); defaults to 3x3@3000 up to 6x8@15000")
+    parser.add_argument("--quick", action="store_true", help="Only the two smallest default sheets")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per stage; the best is reported")
+    parser.add_argument("--upscale-width", type=int, default=engine.DEFAULT_UPSCALE_WIDTH,
+                        help="Upscale narrower sheets to this width, as the app does")
+    parser.add_argument("--resolution", choices=engine.RESOLUTION_MODES, default="1080 tall")
+    parser.add_argument("--threads", type=int, help="OpenCV threads (default: OpenCV's choice)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="Write the JSON here instead of stdout")
+    args = parser.parse_args()
+
+    sheets = args.sheet or (DEFAULT_SHEETS[:2] if args.quick else DEFAULT_SHEETS)
+    if args.threads is not None:
+        cv2.setNumThreads(args.threads)
+
+    tracemalloc.start()
+    results = []
+    with tempfile.TemporaryDirectory(prefix="storyapp-bench-") as scratch:
+        for rows, cols, width in sheets:
+            print(f"{rows}x{cols} @ {width}px ...", file=sys.stderr)
+            results.append(bench_sheet(rows, cols, width, args, scratch))
+    tracemalloc.stop()
+
+    report = {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "cpus": os.cpu_count(),
+        "opencv_threads": cv2.getNumThreads(),
+        "resolution": args.resolution,
+        "repeat": args.repeat,
+        "stage_notes": {"warp": "includes scaling to the output resolution",
+                        "thumbnail": f"{THUMBNAIL_HEIGHT}px preview strip thumbnails"},
+        "sheets": results,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
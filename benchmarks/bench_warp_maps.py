@@ -0,0 +1,69 @@
+"""Compare per-sheet panel warping with and without precomputed warp maps.
+
+    python benchmarks/bench_warp_maps.py [sheet.jpg] [--sheets 20] [--upscale-width 7000]
+
+Panels are found with the detector on the first sheet, then the same
+layout is extracted from it repeatedly, as a batch of identical template
+sheets would be.
+"""
+import argparse
+import os
+import sys
+import time
+
+import cv2
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from storyapp import engine  # noqa: E402
+from storyapp.detect import detect_panels  # noqa: E402
+
+DEFAULT_SHEET = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "sample:",
+                             "sample:sample_image.jpg")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("sheet", nargs="?", default=DEFAULT_SHEET)
+    parser.add_argument("--sheets", type=int, default=20, help="Sheets to simulate per run")
+    parser.add_argument("--upscale-width", type=int, default=engine.DEFAULT_UPSCALE_WIDTH)
+    parser.add_argument("--resolution", choices=engine.RESOLUTION_MODES, default="1080 tall")
+    parser.add_argument("--defer-upscale", action="store_true")
+    args = parser.parse_args()
+
+    # Single threaded, like a batch worker process
+    cv2.setNumThreads(1)
+
+    img = engine.load_image(args.sheet)
+    if img is None:
+        parser.error(f"Can't read {args.sheet}")
+    if args.defer_upscale:
+        image, upscale = img, args.upscale_width / img.shape[1]
+    else:
+        image, upscale = engine.upscale_image(img, args.upscale_width), 1.0
+    boxes = detect_panels(image)
+    print(f"{os.path.basename(args.sheet)}: {image.shape[1]}x{image.shape[0]}, {len(boxes)} panels, "
+          f"{args.resolution}, {args.sheets} sheets")
+
+    start = time.perf_counter()
+    for _ in range(args.sheets):
+        for box in boxes:
+            engine.extract_panel(image, box, args.resolution, upscale=upscale)
+    direct = time.perf_counter() - start
+
+    start = time.perf_counter()
+    plans = engine.plan_panels(boxes, image.shape, args.resolution, upscale)
+    planning = time.perf_counter() - start
+    for _ in range(args.sheets):
+        for plan in plans:
+            engine.extract_planned(image, plan)
+    planned = time.perf_counter() - start
+
+    print(f"warpPerspective:  {direct:7.3f}s  ({direct / args.sheets * 1000:6.1f} ms/sheet)")
+    print(f"warp maps:        {planned:7.3f}s  ({(planned - planning) / args.sheets * 1000:6.1f} ms/sheet "
+          f"+ {planning * 1000:.0f} ms planning)")
+    print(f"speedup:          {direct / planned:7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Synthetic storyboard thumbnail sheets for benchmarks.
+
+A sheet is off-white paper with a grid of hand-drawn looking frames: each
+frame's corners are jittered a little so no frame is a perfect rectangle,
+its outline is a doubled pencil stroke, and the inside holds a few random
+pencil scribbles. Returns the sheet and the frames' true corners, so
+benchmarks can warp panels without running detection.
+"""
+import cv2
+import numpy as np
+
+# Fraction of the sheet width left as margin around the grid and between frames
+MARGIN = 0.03
+GUTTER = 0.02
+
+# Largest corner jitter, as a fraction of a frame's width
+SKEW = 0.006
+
+
+def _pencil_line(img, p0, p1, rng, thickness):
+    """Draw a slightly wobbly graphite stroke from p0 to p1"""
+    length = np.hypot(*(np.asarray(p1) - p0))
+    steps = max(2, int(length / 40))
+    t = np.linspace(0, 1, steps)[:, None]
+    pts = np.asarray(p0) * (1 - t) + np.asarray(p1) * t
+    pts += rng.normal(0, thickness * 0.4, pts.shape)
+    shade = int(rng.integers(70, 120))
+    cv2.polylines(img, [pts.astype(np.int32)], False, (shade, shade, shade + 5),
+                  thickness, cv2.LINE_AA)
+
+
+def make_sheet(rows, cols, width, seed=0):
+    """Return (sheet, boxes): a BGR sheet width pixels wide and (rows * cols, 4, 2) frame corners"""
+    rng = np.random.default_rng(seed)
+
+    margin = width * MARGIN
+    gutter = width * GUTTER
+    cell_w = (width - 2 * margin - (cols - 1) * gutter) / cols
+    cell_h = cell_w * 9 / 16  # Widescreen thumbnails
+    height = int(2 * margin + rows * cell_h + (rows - 1) * gutter + width * 0.06)  # Room for a title
+
+    # Paper: warm off-white with a little grain
+    sheet = np.empty((height, width, 3), np.uint8)
+    sheet[:] = (232, 238, 242)
+    grain = rng.integers(-6, 7, (height // 4 + 1, width // 4 + 1), dtype=np.int16)
+    grain = cv2.resize(grain.astype(np.float32), (width, height), interpolation=cv2.INTER_LINEAR)
+    sheet = np.clip(sheet + grain[..., None], 0, 255).astype(np.uint8)
+
+    thickness = max(1, width // 1500)
+    top = margin + width * 0.06
+    cv2.putText(sheet, "SEQ 010", (int(margin), int(margin + width * 0.035)),
+                cv2.FONT_HERSHEY_SIMPLEX, width / 1200, (90, 90, 95), thickness * 2, cv2.LINE_AA)
+
+    boxes = []
+    for r in range(rows):
+        for c in range(cols):
+            x0 = margin + c * (cell_w + gutter)
+            y0 = top + r * (cell_h + gutter)
+            corners = np.array([[x0, y0], [x0 + cell_w, y0],
+                                [x0 + cell_w, y0 + cell_h], [x0, y0 + cell_h]])
+            corners += rng.uniform(-SKEW, SKEW, corners.shape) * cell_w
+            boxes.append(corners)
+
+            # Frame outline, gone over twice like a hand-drawn box
+            for _ in range(2):
+                for i in range(4):
+                    _pencil_line(sheet, corners[i], corners[(i + 1) % 4], rng, thickness)
+
+            # A few loose strokes for the drawing inside
+            inner = corners.mean(axis=0)
+            for _ in range(int(rng.integers(4, 9))):
+                p0 = inner + rng.uniform(-0.4, 0.4, 2) * (cell_w, cell_h)
+                p1 = inner + rng.uniform(-0.4, 0.4, 2) * (cell_w, cell_h)
+                _pencil_line(sheet, p0, p1, rng, thickness)
+            axes = (int(cell_w * rng.uniform(0.05, 0.15)), int(cell_h * rng.uniform(0.1, 0.25)))
+            center = tuple(int(v) for v in inner + rng.uniform(-0.2, 0.2, 2) * (cell_w, cell_h))
+            cv2.ellipse(sheet, center, axes, float(rng.uniform(0, 180)), 0, 360,
+                        (100, 100, 105), thickness, cv2.LINE_AA)
+
+    return sheet, np.round(np.array(boxes)).astype(np.int32)
@@ -0,0 +1,13 @@
+"""Headless building blocks of The Story App storyboard panel extractor.
+
+None of these modules import tkinter, so they load without a display:
+
+- engine: load, upscale, adjust, warp and write panels; export naming
+- geometry: vectorized quad canonicalization, sizes and validation
+- detect, snap: automatic frame detection and snapping clicks to frame corners
+- grid, layout: grid templates and saved panel layouts
+- export, parallel, batch, cli: writing panels on threads, processes and many sheets
+- cache, jobs: the decoded image cache and background job runner the GUI uses
+- tiles: the tile pyramid behind the GUI's zoomable sheet view
+- trace: optional per-stage timing spans and Chrome trace export
+"""
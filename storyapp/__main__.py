@@ -0,0 +1,5 @@
+import sys
+
+from storyapp.cli import main
+
+sys.exit(main())
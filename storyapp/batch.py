@@ -0,0 +1,109 @@
+"""Headless batch extraction of panels from many sheets across all cores."""
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cv2
+
+from storyapp import engine
+from storyapp.export import write_panels
+from storyapp.layout import layout_boxes
+
+# Bytes of warp plans kept per worker process. A plan's remap tables take 6 bytes per
+# output pixel of every panel (about 110MB for nine 1080p panels); the plan for the
+# latest sheet size is always kept, older ones only while they fit.
+PLAN_CACHE_BYTES = 128 << 20
+
+_plan_cache = OrderedDict()
+
+
+def _plans_nbytes(plans):
+    return sum(map1.nbytes + map2.nbytes for map1, map2 in (plan["maps"] for plan in plans))
+
+
+def _init_worker():
+    """Keep OpenCV single threaded inside each worker so processes don't oversubscribe cores"""
+    cv2.setNumThreads(1)
+
+
+def _panel_plans(boxes, image_shape, resolution_mode, upscale):
+    """Warp plans for a layout on sheets of one size, built on first use in this process"""
+    key = (image_shape, resolution_mode, upscale, tuple(box.tobytes() for box in boxes))
+    plans = _plan_cache.get(key)
+    if plans is None:
+        plans = engine.plan_panels(boxes, image_shape, resolution_mode, upscale)
+        _plan_cache[key] = plans
+        total = sum(_plans_nbytes(cached) for cached in _plan_cache.values())
+        while len(_plan_cache) > 1 and total > PLAN_CACHE_BYTES:
+            _, evicted = _plan_cache.popitem(last=False)
+            total -= _plans_nbytes(evicted)
+    else:
+        _plan_cache.move_to_end(key)
+    return plans
+
+
+def extract_sheet(path, layout, out_dir, prefix="", upscale_width=None, resolution_mode=None,
+                  start_number=1, defer_upscale=False, write_workers=1, warp_maps=False):
+    """Run load, upscale, adjust, warp and encode for one sheet and return the files written"""
+    img = engine.load_image(path)
+    if img is None:
+        raise ValueError(f"Failed to load image: {path}")
+
+    upscale_width = upscale_width or layout["upscale_width"]
+    resolution_mode = resolution_mode or layout["resolution"]
+    # Name panels after their sheet so a batch never overwrites its own output
+    base_name = prefix + os.path.splitext(os.path.basename(path))[0] + "_"
+
+    # Same sequence of operations as the GUI, so the exported files are identical
+    if defer_upscale:
+        # Stay at native resolution and let each panel's warp do the upscale
+        image = img
+        upscale = upscale_width / img.shape[1]
+    else:
+        image = engine.upscale_image(img, upscale_width)
+        upscale = 1.0
+
+    boxes = layout_boxes(layout, image.shape[1])
+    plans = None
+    if warp_maps:
+        # Reuse each panel's remap tables for every sheet of the same size
+        plans = _panel_plans(boxes, image.shape, resolution_mode, upscale)
+
+    def panels():
+        for i, box in enumerate(boxes):
+            # Adjustments run over each panel's region only, as in the GUI
+            if plans is None:
+                panel = engine.extract_panel(image, box, resolution_mode, upscale=upscale,
+                                             adjustments=layout["adjustments"])
+            else:
+                panel = engine.extract_planned(image, plans[i], adjustments=layout["adjustments"])
+            yield os.path.join(out_dir, engine.panel_filename(base_name, start_number + i)), panel
+
+    # Sheets already run one per process, so encoding stays on this thread by default
+    return write_panels(panels(), workers=write_workers)
+
+
+def run_batch(paths, layout, out_dir, workers=None, on_result=None, **options):
+    """Extract every sheet in a process pool, returning ({path: files}, {path: error})"""
+    os.makedirs(out_dir, exist_ok=True)
+
+    results = {}
+    errors = {}
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=min(workers, len(paths)) or 1,
+                             initializer=_init_worker) as pool:
+        futures = {
+            pool.submit(extract_sheet, path, layout, out_dir, **options): path
+            for path in paths
+        }
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                results[path] = future.result()
+                error = None
+            except Exception as e:
+                errors[path] = e
+                error = e
+            if on_result:
+                on_result(path, results.get(path, []), error)
+    return results, errors
@@ -0,0 +1,152 @@
+"""Cache of decoded (and upscaled) sheets, so reopening a recent file is instant.
+
+Entries are keyed by the file's path, modification time and size plus the
+upscale width, so an edited file or a different width is a miss. Recently
+used images are kept in memory up to a byte budget; entries are also
+written, on a thread of their own so the caller can show the image right
+away, to a disk tier of raw .npy arrays, which are memory-mapped back in on
+a hit and evicted oldest first once the tier outgrows its own budget.
+Images that are already memory maps (e.g. scratch files) stay out of the
+disk tier rather than being written to disk a second time.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# Bytes of decoded images kept in memory (about nine 7000px wide sheets)
+MEMORY_BUDGET = 1 << 30
+
+# Bytes of .npy files kept in the disk tier
+DISK_BUDGET = 8 << 30
+
+
+def default_cache_dir():
+    """Per-user cache directory for the disk tier"""
+    base = os.environ.get("LOCALAPPDATA") or os.environ.get("XDG_CACHE_HOME") or \
+        os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "storyapp", "images")
+
+
+def image_key(path, upscale_width=None):
+    """Cache key for a sheet decoded from path; upscale_width None means native resolution"""
+    stat = os.stat(path)
+    return (os.path.abspath(path), stat.st_mtime_ns, stat.st_size, upscale_width)
+
+
+class ImageCache:
+    """Two tier LRU cache of decoded images; safe to use from worker threads.
+
+    Images handed out may be read-only memory maps, so callers must copy
+    before modifying them (the engine never modifies its input).
+    """
+
+    def __init__(self, cache_dir=None, memory_budget=MEMORY_BUDGET, disk_budget=DISK_BUDGET):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.memory_budget = memory_budget
+        self.disk_budget = disk_budget
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+
+    def _disk_path(self, key):
+        digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, digest + ".npy")
+
+    def get(self, key):
+        """Return the cached image for key, or None"""
+        with self._lock:
+            img = self._memory.get(key)
+            if img is not None:
+                self._memory.move_to_end(key)
+                return img
+
+        path = self._disk_path(key)
+        try:
+            img = np.load(path, mmap_mode="r")
+            os.utime(path)  # Mark as recently used for disk eviction
+        except (OSError, ValueError):
+            return None
+
+        self._remember(key, img)
+        return img
+
+    def put(self, key, img):
+        """Store an image in memory now and in the disk tier in the background.
+
+        The image must not be modified afterwards, as the disk write may
+        still be reading it.
+        """
+        self._remember(key, img)
+
+        if self.disk_budget <= 0 or img.nbytes > self.disk_budget or isinstance(img, np.memmap):
+            return
+        # Not a daemon, so quitting waits for the entry rather than leaving a partial file
+        threading.Thread(target=self._write_disk, args=(key, img), name="storyapp-cache-write").start()
+
+    def _write_disk(self, key, img):
+        """Write one entry to the disk tier and evict the oldest ones over its budget"""
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = self._disk_path(key)
+            # Write under a temporary name so a crash never leaves a truncated entry
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                np.save(f, img)
+            os.replace(tmp_path, path)
+            self._evict_disk()
+        except OSError as e:
+            # The disk tier is only an optimization
+            print(f"Could not write image cache entry: {e}")
+
+    def _remember(self, key, img):
+        """Add to the memory tier, evicting least recently used images over the budget"""
+        if img.nbytes > self.memory_budget:
+            return
+        with self._lock:
+            old = self._memory.pop(key, None)
+            if old is not None:
+                self._memory_bytes -= old.nbytes
+            self._memory[key] = img
+            self._memory_bytes += img.nbytes
+            while self._memory_bytes > self.memory_budget:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_bytes -= evicted.nbytes
+
+    def _evict_disk(self):
+        """Delete the least recently used .npy files until the disk tier fits its budget"""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".npy"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.disk_budget:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass  # In use (e.g. memory-mapped on Windows); try again next time
+
+    def clear(self):
+        """Drop every entry from both tiers"""
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+        if os.path.isdir(self.cache_dir):
+            for name in os.listdir(self.cache_dir):
+                if name.endswith(".npy"):
+                    try:
+                        os.remove(os.path.join(self.cache_dir, name))
+                    except OSError:
+                        pass
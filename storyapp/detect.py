@@ -0,0 +1,163 @@
+"""Automatic detection of rectangular thumbnail frames on a storyboard sheet.
+
+Detection runs on a downscaled proxy of the sheet: pencil lines are
+thresholded, only long horizontal and vertical strokes are kept (so the
+drawings inside the frames mostly drop out), and the outlines of the
+remaining line network are fitted with quadrilaterals. The quads are mapped
+back to full resolution and returned in reading order, ready to be used as
+panel boxes.
+"""
+import cv2
+import numpy as np
+
+from storyapp import engine, geometry
+
+# Width of the proxy the detector works on
+DETECT_WIDTH = 1200
+
+# Panels smaller/larger than these fractions of the sheet are ignored
+MIN_PANEL_AREA = 0.005
+MAX_PANEL_AREA = 0.6
+
+# How far a frame corner may be from 90 degrees before the quad is rejected
+MAX_CORNER_SKEW = 30
+
+
+def line_mask(proxy):
+    """Binary mask of the long horizontal and vertical strokes in the proxy"""
+    gray = cv2.cvtColor(proxy, cv2.COLOR_BGR2GRAY)
+
+    # Adaptive threshold copes with uneven lighting on photographed sketchbooks
+    bw = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_MEAN_C,
+                               cv2.THRESH_BINARY_INV, 31, 10)
+    bw = cv2.dilate(bw, np.ones((3, 3), np.uint8))
+
+    # Keep only strokes long enough to be frame lines
+    length = max(proxy.shape[1] // 30, 10)
+    horizontal = cv2.morphologyEx(bw, cv2.MORPH_OPEN,
+                                  cv2.getStructuringElement(cv2.MORPH_RECT, (length, 1)))
+    vertical = cv2.morphologyEx(bw, cv2.MORPH_OPEN,
+                                cv2.getStructuringElement(cv2.MORPH_RECT, (1, length)))
+    lines = cv2.bitwise_or(horizontal, vertical)
+
+    # Bridge the small gaps hand drawn frames leave at their corners
+    return cv2.morphologyEx(lines, cv2.MORPH_CLOSE, np.ones((5, 5), np.uint8))
+
+
+def _fit_quad(contour, min_area, max_area):
+    """Fit a four corner polygon to a contour, or return None if it isn't frame shaped"""
+    area = cv2.contourArea(contour)
+    if area < min_area or area > max_area:
+        return None
+
+    hull = cv2.convexHull(contour)
+    approx = cv2.approxPolyDP(hull, 0.02 * cv2.arcLength(hull, True), True).reshape(-1, 2)
+    if len(approx) < 4:
+        return None
+
+    # Drop the vertices that add the least area until four are left, which
+    # shaves off small bumps where a stroke touches the frame
+    pts = approx.astype(np.float64)
+    while len(pts) > 4:
+        prev_pts = np.roll(pts, 1, axis=0)
+        next_pts = np.roll(pts, -1, axis=0)
+        cross = ((pts[:, 0] - prev_pts[:, 0]) * (next_pts[:, 1] - prev_pts[:, 1]) -
+                 (pts[:, 1] - prev_pts[:, 1]) * (next_pts[:, 0] - prev_pts[:, 0]))
+        pts = np.delete(pts, np.argmin(np.abs(cross)), axis=0)
+
+    # The outline must fill the quad, which rules out the spiral binding, titles, etc.
+    quad_area = cv2.contourArea(pts.astype(np.float32))
+    if quad_area <= 0 or not 0.85 <= area / quad_area <= 1.15:
+        return None
+
+    # Every corner should be roughly square
+    for i in range(4):
+        a = pts[i - 1] - pts[i]
+        b = pts[(i + 1) % 4] - pts[i]
+        cos = np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b) + 1e-9)
+        if abs(np.degrees(np.arccos(np.clip(cos, -1, 1))) - 90) > MAX_CORNER_SKEW:
+            return None
+
+    return pts
+
+
+def _reading_order(quads):
+    """Sort quads into rows from top to bottom, each row left to right"""
+    if not quads:
+        return quads
+
+    centers = np.array([q.mean(axis=0) for q in quads])
+    heights = np.array([q[:, 1].max() - q[:, 1].min() for q in quads])
+    row_gap = np.median(heights) / 2
+
+    rows = []
+    for i in np.argsort(centers[:, 1]):
+        if rows and centers[i, 1] - np.mean(centers[rows[-1], 1]) < row_gap:
+            rows[-1].append(i)
+        else:
+            rows.append([i])
+
+    ordered = []
+    for row in rows:
+        ordered.extend(quads[i] for i in sorted(row, key=lambda i: centers[i, 0]))
+    return ordered
+
+
+def detect_panels(image, detect_width=DETECT_WIDTH, adjustments=None):
+    """Find the thumbnail frames on a sheet and return their boxes in reading order.
+
+    Each box is an int32 (4, 2) array of full resolution corners ordered
+    top-left, top-right, bottom-right, bottom-left, like a manual selection.
+    An adjustment stack, if given, is applied to the detection proxy only.
+    """
+    height, width = image.shape[:2]
+    scale = min(1.0, detect_width / width)
+    proxy = image
+    if scale < 1.0:
+        proxy = cv2.resize(image, (detect_width, max(1, int(round(height * scale)))),
+                           interpolation=cv2.INTER_AREA)
+    proxy = engine.apply_adjustments(proxy, adjustments)
+
+    lines = line_mask(proxy)
+    proxy_area = lines.shape[0] * lines.shape[1]
+    min_area = proxy_area * MIN_PANEL_AREA
+    max_area = proxy_area * MAX_PANEL_AREA
+
+    contours, hierarchy = cv2.findContours(lines, cv2.RETR_CCOMP, cv2.CHAIN_APPROX_SIMPLE)
+    if hierarchy is None:
+        return []
+    hierarchy = hierarchy[0]
+
+    quads = []
+    for i, contour in enumerate(contours):
+        # Only look at outer boundaries here; their holes are visited below
+        if hierarchy[i][3] != -1:
+            continue
+
+        holes = []
+        child = hierarchy[i][2]
+        while child != -1:
+            quad = _fit_quad(contours[child], min_area, max_area)
+            if quad is not None:
+                holes.append(quad)
+            child = hierarchy[child][0]
+
+        # Frames sharing their lines form one outline with a similar sized hole
+        # per panel; long strokes inside a single frame leave uneven slivers instead
+        hole_areas = [cv2.contourArea(h.astype(np.float32)) for h in holes]
+        if len(holes) >= 2 and min(hole_areas) >= 0.5 * max(hole_areas):
+            quads.extend(holes)
+            continue
+
+        quad = _fit_quad(contour, min_area, max_area)
+        if quad is not None:
+            quads.append(quad)
+        elif holes:
+            # The outline is spoiled by something touching the frame, but its inside is clean
+            quads.append(holes[int(np.argmax(hole_areas))])
+
+    quads = _reading_order(quads)
+    if not quads:
+        return []
+    corners = geometry.canonical_quads(np.array(quads) / scale)
+    return list(np.round(corners).astype(np.int32))
@@ -0,0 +1,350 @@
+"""Image operations shared by the Story App GUI and the command line tools.
+
+Nothing in here touches Tk, so the same code path can run headless in batch
+jobs and produce exactly the same panels as the interactive app.
+"""
+import os
+import tempfile
+
+import cv2
+import numpy as np
+
+from storyapp import geometry, trace
+
+# Default width the loaded sheet is upscaled to before panels are extracted
+DEFAULT_UPSCALE_WIDTH = 7000
+
+# Resolution settings offered in the panel selection controls
+RESOLUTION_MODES = ("1080 tall", "1920 wide", "auto")
+
+# JPEG quality used for exported panels
+JPEG_QUALITY = 95
+
+# Rows adjust_image processes at a time, which bounds its scratch memory
+ADJUST_STRIP_ROWS = 512
+
+# Extra pixels around a panel's bounding box that warp interpolation can read
+WARP_MARGIN = 3
+
+# Reduced decode used for the first look at a sheet while the full image loads
+PREVIEW_READ_FLAG = cv2.IMREAD_REDUCED_COLOR_4
+
+
+@trace.traced("load")
+def load_image(path):
+    """Read an image from disk as BGR, or return None if it can't be decoded"""
+    return cv2.imread(path)
+
+
+@trace.traced("load preview")
+def load_preview(path):
+    """Decode a quarter size copy of an image, or return None if it can't be decoded.
+
+    JPEG decoders scale while decoding, so this takes a fraction of the time
+    of load_image; other formats are decoded in full and then shrunk.
+    """
+    return cv2.imread(path, PREVIEW_READ_FLAG)
+
+
+def upscaled_shape(shape, upscale_width):
+    """Shape upscale_image gives an image of the given shape"""
+    height, width = shape[:2]
+    return (int(height * (upscale_width / width)), upscale_width) + tuple(shape[2:])
+
+
+@trace.traced("upscale")
+def upscale_image(img, upscale_width, out=None):
+    """Upscale an image to the given width, keeping its aspect ratio.
+
+    out, if given, is an upscaled_shape() array to write into, e.g. a
+    scratch_image().
+    """
+    new_height, upscale_width = upscaled_shape(img.shape, upscale_width)[:2]
+
+    # Upscale using INTER_CUBIC for better quality
+    return cv2.resize(img, (upscale_width, new_height), dst=out, interpolation=cv2.INTER_CUBIC)
+
+
+def scratch_image(shape, dtype=np.uint8, directory=None):
+    """An uninitialized image backed by an anonymous temporary file instead of RAM.
+
+    The OS pages it in and out as it is read, so a sheet larger than the
+    free memory can still be worked on. The file is removed once the array
+    is no longer referenced.
+    """
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with tempfile.TemporaryFile(dir=directory) as f:
+        # The mapping keeps its own handle to the file, so it can be closed here
+        return np.memmap(f, dtype=dtype, mode="w+", shape=tuple(shape))
+
+
+def fit_scale(shape, max_width, max_height):
+    """Scale that fits an image of the given shape inside max_width x max_height"""
+    height, width = shape[:2]
+    return min(max_width / width, max_height / height)
+
+
+def shrink_image(img, scale):
+    """Downscaled copy of an image for display or analysis (area averaging, at least 1px)"""
+    height, width = img.shape[:2]
+    size = (max(1, int(width * scale)), max(1, int(height * scale)))
+    return cv2.resize(img, size, interpolation=cv2.INTER_AREA)
+
+
+def to_rgb(img):
+    """BGR image as RGB, for display toolkits"""
+    return cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+
+
+def adjustment_luts(brightness, contrast, saturation):
+    """Build the 256-entry lookup tables that adjust_image applies"""
+    ramp = np.arange(256, dtype=np.uint8).reshape(1, 256)
+
+    # Saturation scales the HSV S channel, clipped and truncated like a float32 pass would;
+    # H and V pass through unchanged
+    sat = np.clip(ramp.astype(np.float32) * saturation, 0, 255).astype(np.uint8)
+    hsv_lut = cv2.merge([ramp, sat, ramp])
+
+    # Brightness and contrast: exactly what convertScaleAbs does to each level
+    bc_lut = cv2.convertScaleAbs(ramp, alpha=contrast, beta=brightness)
+
+    return hsv_lut, bc_lut
+
+
+def adjust_image(img, brightness, contrast, saturation, out=None):
+    """Apply saturation, then brightness and contrast, to a BGR image.
+
+    Works through the image in strips of ADJUST_STRIP_ROWS rows using lookup
+    tables, so the only full size buffer is the output. Pass out=img to
+    adjust in place.
+    """
+    hsv_lut, bc_lut = adjustment_luts(brightness, contrast, saturation)
+
+    if out is None:
+        out = np.empty_like(img)
+
+    height, width = img.shape[:2]
+    rows = min(ADJUST_STRIP_ROWS, height)
+    hsv = np.empty((rows, width, 3), np.uint8)
+    bgr = np.empty((rows, width, 3), np.uint8)
+
+    for y in range(0, height, rows):
+        n = min(rows, height - y)
+
+        # Apply saturation
+        cv2.cvtColor(img[y:y+n], cv2.COLOR_BGR2HSV, dst=hsv[:n])
+        cv2.LUT(hsv[:n], hsv_lut, dst=hsv[:n])
+        cv2.cvtColor(hsv[:n], cv2.COLOR_HSV2BGR, dst=bgr[:n])
+
+        # Apply brightness and contrast
+        cv2.LUT(bgr[:n], bc_lut, dst=out[y:y+n])
+
+    return out
+
+
+def adjustment_step(brightness, contrast, saturation):
+    """One entry of an adjustment stack"""
+    return {"brightness": brightness, "contrast": contrast, "saturation": saturation}
+
+
+@trace.traced("adjust")
+def apply_adjustments(img, adjustments):
+    """Run an adjustment stack over an image, returning a new array (or img if the stack is empty)"""
+    result = img
+    for step in adjustments or ():
+        # The first step allocates the output, later ones work in place on it
+        result = adjust_image(result, step["brightness"], step["contrast"], step["saturation"],
+                              out=None if result is img else result)
+    return result
+
+
+def sort_corners(pts):
+    """Sort corners: top-left, top-right, bottom-right, bottom-left"""
+    return geometry.canonical_quads(pts)[0]
+
+
+def panel_transforms(boxes, resolution_mode, upscale=1.0):
+    """Homographies, output (width, height) sizes and interpolation flag for many panels' warps.
+
+    The scale to 1080 tall or 1920 wide is folded into each homography, so
+    a panel is resampled once, straight to its final size. With upscale !=
+    1.0 the boxes are in native sheet pixels; panels are sized as if the
+    sheet had been upscaled by that factor, and the upscale is folded in too.
+    """
+    # Get the four corners of every panel
+    src_points = geometry.canonical_quads(np.asarray(boxes, dtype=np.float32))
+
+    # Calculate width and height while maintaining the original panel dimensions
+    # (averages of opposite sides, measured in upscaled sheet pixels)
+    widths, heights = geometry.quad_sizes(src_points * upscale)
+    widths = widths.astype(int)
+
+    # Round height up to the nearest 100 pixels
+    heights = (np.ceil(heights.astype(int) / 100.0) * 100).astype(int)
+
+    # Define destination points for perfect rectangles
+    right, bottom = widths - 1, heights - 1
+    zeros = np.zeros_like(widths)
+    dst_points = np.stack([
+        np.stack([zeros, zeros], -1),   # top-left
+        np.stack([right, zeros], -1),   # top-right
+        np.stack([right, bottom], -1),  # bottom-right
+        np.stack([zeros, bottom], -1)   # bottom-left
+    ], axis=1)
+
+    # Calculate perspective transforms (native pixels straight to the upscaled panels)
+    Ms = geometry.homographies(src_points, dst_points)
+
+    # Scale the rectangles to the output size, mapping pixel centers the way cv2.resize does
+    sizes = [resolution_size(int(w), int(h), resolution_mode) for w, h in zip(widths, heights)]
+    for M, (w, h), (out_w, out_h) in zip(Ms, zip(widths, heights), sizes):
+        if (out_w, out_h) != (w, h):
+            sx = out_w / w
+            sy = out_h / h
+            M[:] = np.array([[sx, 0, 0.5 * sx - 0.5],
+                             [0, sy, 0.5 * sy - 0.5],
+                             [0, 0, 1]]) @ M
+
+    # When the warp also does the upscale, use cubic like upscale_image does
+    flags = cv2.INTER_LINEAR if upscale == 1.0 else cv2.INTER_CUBIC
+    return Ms, sizes, flags
+
+
+def panel_transform(box, resolution_mode, upscale=1.0):
+    """panel_transforms for a single box: (homography, (width, height), flags)"""
+    Ms, sizes, flags = panel_transforms([box], resolution_mode, upscale)
+    return Ms[0], sizes[0], flags
+
+
+@trace.traced("warp")
+def warp_panel(image, box, resolution_mode, upscale=1.0):
+    """Warp one selected quad into a perfect rectangle at the requested resolution"""
+    M, size, flags = panel_transform(box, resolution_mode, upscale)
+    return cv2.warpPerspective(image, M, size, flags=flags)
+
+
+def panel_region(box, image_shape, margin=WARP_MARGIN):
+    """Bounding box (x0, y0, x1, y1) of a quad, padded for interpolation and clipped to the image"""
+    box = np.asarray(box)
+    height, width = image_shape[:2]
+    x0 = max(int(np.floor(box[:, 0].min())) - margin, 0)
+    y0 = max(int(np.floor(box[:, 1].min())) - margin, 0)
+    x1 = min(int(np.ceil(box[:, 0].max())) + margin + 1, width)
+    y1 = min(int(np.ceil(box[:, 1].max())) + margin + 1, height)
+    return x0, y0, x1, y1
+
+
+def extract_panel(image, box, resolution_mode, upscale=1.0, adjustments=None):
+    """Adjust only the panel's region of the unadjusted sheet, then warp it.
+
+    The warp reads a view of the padded bounding box, so a memory-mapped
+    sheet only pages in the panel's rows. The adjustments are per-pixel, so
+    running them over that region gives the same pixels the warp would have
+    read from a fully adjusted sheet, at a fraction of the cost.
+    """
+    x0, y0, x1, y1 = panel_region(box, image.shape)
+    region = apply_adjustments(image[y0:y1, x0:x1], adjustments)
+    return warp_panel(region, np.asarray(box) - (x0, y0), resolution_mode, upscale=upscale)
+
+
+def plan_panels(boxes, image_shape, resolution_mode, upscale=1.0):
+    """Precompute the warps of a layout's panels on sheets with the given shape.
+
+    Returns a plan dict per panel holding its padded region and fixed-point
+    remap tables (the format cv2.convertMaps produces), so extracting the
+    same panels from many sheets of that size skips the per-pixel homography
+    math that warpPerspective redoes on every call.
+    """
+    regions = [panel_region(box, image_shape) for box in boxes]
+    local_boxes = [np.asarray(box) - (x0, y0) for box, (x0, y0, _, _) in zip(boxes, regions)]
+    Ms, sizes, flags = panel_transforms(local_boxes, resolution_mode, upscale)
+
+    plans = []
+    for region, M, (width, height) in zip(regions, Ms, sizes):
+        # Source position of every output pixel, through the inverse homography
+        inv = np.linalg.inv(M)
+        xs = np.arange(width, dtype=np.float64)
+        ys = np.arange(height, dtype=np.float64)[:, None]
+        w = inv[2, 0] * xs + inv[2, 1] * ys + inv[2, 2]
+        map_x = ((inv[0, 0] * xs + inv[0, 1] * ys + inv[0, 2]) / w).astype(np.float32)
+        map_y = ((inv[1, 0] * xs + inv[1, 1] * ys + inv[1, 2]) / w).astype(np.float32)
+
+        map1, map2 = cv2.convertMaps(map_x, map_y, cv2.CV_16SC2)
+        plans.append({"region": region, "maps": (map1, map2), "flags": flags})
+    return plans
+
+
+def extract_planned(image, plan, adjustments=None):
+    """extract_panel using a plan from plan_panels; image must have the shape it was planned for"""
+    x0, y0, x1, y1 = plan["region"]
+    region = apply_adjustments(image[y0:y1, x0:x1], adjustments)
+    map1, map2 = plan["maps"]
+    with trace.span("warp"):
+        return cv2.remap(region, map1, map2, plan["flags"])
+
+
+def resolution_size(width, height, resolution_mode):
+    """Output (width, height) of a panel for a resolution setting"""
+    if resolution_mode == "auto":
+        return width, height
+
+    if resolution_mode == "1080 tall":
+        # Scale to 1080px height
+        scale_factor = 1080 / height
+        return int(width * scale_factor), 1080
+
+    if resolution_mode == "1920 wide":
+        # Scale to 1920px width
+        scale_factor = 1920 / width
+        return 1920, int(height * scale_factor)
+
+    raise ValueError(f"Unknown resolution setting: {resolution_mode}")
+
+
+def thumbnail(panel, height):
+    """Small copy of a panel, scaled to the given height"""
+    panel_height, panel_width = panel.shape[:2]
+    width = max(1, int(panel_width * height / panel_height))
+    return cv2.resize(panel, (width, height))
+
+
+def panel_filename(base_name, panel_number):
+    """Format an export filename with a zero padded panel number"""
+    return f"{base_name}{panel_number:03d}.jpg"
+
+
+def next_panel_number(directory, base_name, default=1):
+    """Find the number after the highest existing export for continue mode"""
+    # Get all files matching the base name pattern
+    existing_files = [f for f in os.listdir(directory)
+                      if f.startswith(base_name) and f.endswith(".jpg")]
+
+    # Extract numbers from existing files
+    existing_numbers = []
+    for filename in existing_files:
+        # Try to extract number from filename (e.g., panel_001.jpg -> 1)
+        number_part = filename[len(base_name):-4]  # Remove base_name and .jpg
+        try:
+            existing_numbers.append(int(number_part))
+        except ValueError:
+            # If conversion fails, just skip this file
+            pass
+
+    # Set start number to one more than the highest existing number
+    if existing_numbers:
+        return max(existing_numbers) + 1
+    return default
+
+
+def export_start_number(directory, base_name, numbering_mode, start_number=1):
+    """First panel number of an export: start_number to overwrite, or after the highest existing file to continue"""
+    if numbering_mode == "continue":
+        return next_panel_number(directory, base_name, default=start_number)
+    return start_number
+
+
+@trace.traced("encode")
+def write_panel(filepath, panel):
+    """Encode a panel as JPEG and write it to disk"""
+    return cv2.imwrite(filepath, panel, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
@@ -0,0 +1,52 @@
+"""Writing exported panels to disk."""
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from storyapp import engine
+
+
+def default_write_workers():
+    """Encoder threads to use when none are configured: one per core"""
+    return os.cpu_count() or 1
+
+
+def write_panels(items, workers=None, on_written=None):
+    """Encode and write (filepath, panel) items as JPEGs on a bounded thread pool.
+
+    OpenCV releases the GIL while encoding, so panels are compressed and
+    written in parallel. items may be a generator (e.g. one that warps panels
+    lazily): at most 2 * workers panels are held in flight. on_written(index,
+    filepath) is called in the calling thread, in item order. Returns the
+    written paths; raises IOError if a panel can't be written.
+    """
+    workers = max(1, workers or default_write_workers())
+    written = []
+
+    def finish(index, filepath, ok):
+        if not ok:
+            raise IOError(f"Failed to write {filepath}")
+        written.append(filepath)
+        if on_written:
+            on_written(index, filepath)
+
+    if workers == 1:
+        for index, (filepath, panel) in enumerate(items):
+            finish(index, filepath, engine.write_panel(filepath, panel))
+        return written
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for index, (filepath, panel) in enumerate(items):
+            pending.append((index, filepath, pool.submit(engine.write_panel, filepath, panel)))
+
+            # Bound the panels in flight; report the oldest ones as they finish
+            while len(pending) >= 2 * workers:
+                index, filepath, future = pending.popleft()
+                finish(index, filepath, future.result())
+
+        while pending:
+            index, filepath, future = pending.popleft()
+            finish(index, filepath, future.result())
+
+    return written
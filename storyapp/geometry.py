@@ -0,0 +1,177 @@
+"""Vectorized geometry for panel quads.
+
+Every function works on a whole layout at once: quads are an (N, 4, 2)
+array of [x, y] corners, so canonical corner order, sizes, homographies and
+sanity checks for all panels of a sheet cost a handful of numpy operations
+instead of a Python loop per panel.
+"""
+import numpy as np
+
+# Corners closer together than this (in pixels) count as repeated, e.g. the
+# duplicated last point complete_panel adds when a panel has only three clicks
+MIN_EDGE = 2.0
+
+# A quad covering less than this fraction of its bounding box is a sliver
+MIN_AREA_RATIO = 0.05
+
+
+def as_quads(quads):
+    """Coerce one quad or a list of quads to an (N, 4, 2) float array"""
+    quads = np.asarray(quads)
+    if quads.ndim == 2:
+        quads = quads[None]
+    if quads.ndim != 3 or quads.shape[1:] != (4, 2):
+        raise ValueError(f"Expected quads of shape (N, 4, 2), got {quads.shape}")
+    if not np.issubdtype(quads.dtype, np.floating):
+        quads = quads.astype(np.float32)
+    return quads
+
+
+def canonical_quads(quads):
+    """Order each quad's corners top-left, top-right, bottom-right, bottom-left.
+
+    Corners are sorted by angle around the quad's center, then rotated so
+    the corner with the smallest x + y comes first.
+    """
+    quads = as_quads(quads)
+    center = quads.mean(axis=1, keepdims=True)
+    angles = np.arctan2(quads[..., 1] - center[..., 1], quads[..., 0] - center[..., 0])
+    order = np.argsort(angles, axis=1, kind="stable")
+    quads = np.take_along_axis(quads, order[..., None], axis=1)
+
+    start = np.argmin(quads.sum(axis=2), axis=1)
+    order = (np.arange(4) + start[:, None]) % 4
+    return np.take_along_axis(quads, order[..., None], axis=1)
+
+
+def edge_lengths(quads):
+    """(N, 4) lengths of the top, right, bottom and left edges of canonical quads"""
+    # Kept in the quads' own precision, so panel sizes round as they always have
+    quads = as_quads(quads)
+    return np.linalg.norm(np.roll(quads, -1, axis=1) - quads, axis=2)
+
+
+def quad_sizes(quads):
+    """Widths and heights of canonical quads, each the average of two opposite edges"""
+    edges = edge_lengths(quads)
+    return (edges[:, 0] + edges[:, 2]) / 2, (edges[:, 1] + edges[:, 3]) / 2
+
+
+def quad_areas(quads):
+    """Signed shoelace areas; positive for clockwise corners on an image (y pointing down)"""
+    quads = as_quads(quads).astype(np.float64)
+    x, y = quads[..., 0], quads[..., 1]
+    return 0.5 * np.sum(x * np.roll(y, -1, axis=1) - np.roll(x, -1, axis=1) * y, axis=1)
+
+
+def _turns(quads):
+    """(N, 4) cross products of consecutive edges; all one sign for a convex quad"""
+    quads = as_quads(quads).astype(np.float64)
+    edges = np.roll(quads, -1, axis=1) - quads
+    following = np.roll(edges, -1, axis=1)
+    return edges[..., 0] * following[..., 1] - edges[..., 1] * following[..., 0]
+
+
+def quads_containing(quads, x, y):
+    """Boolean (N,) mask of the quads that contain the point (x, y), edges included"""
+    quads = as_quads(quads).astype(np.float64)
+    a = quads
+    b = np.roll(quads, -1, axis=1)
+
+    # Even-odd rule: count the edges a horizontal ray from the point crosses
+    spans = (a[..., 1] > y) != (b[..., 1] > y)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cross_x = a[..., 0] + (y - a[..., 1]) * (b[..., 0] - a[..., 0]) / (b[..., 1] - a[..., 1])
+    inside = (np.count_nonzero(spans & (x < cross_x), axis=1) % 2) == 1
+
+    # Points on an edge count as inside, like cv2.pointPolygonTest >= 0
+    edge = b - a
+    to_point = np.stack([x - a[..., 0], y - a[..., 1]], axis=-1)
+    cross = edge[..., 0] * to_point[..., 1] - edge[..., 1] * to_point[..., 0]
+    dot = np.sum(edge * to_point, axis=-1)
+    on_edge = (np.abs(cross) <= 1e-9 * np.maximum(np.sum(edge ** 2, axis=-1), 1)) & \
+        (dot >= 0) & (dot <= np.sum(edge ** 2, axis=-1))
+    return inside | on_edge.any(axis=1)
+
+
+def quad_problems(quads, min_edge=MIN_EDGE, min_area_ratio=MIN_AREA_RATIO):
+    """Reason each quad can't be warped into a sensible panel, or None where it's fine.
+
+    Pass canonical quads; returns a list with one entry per quad. Their
+    corners are sorted by angle, so they never cross themselves whatever
+    order the corners were clicked in.
+    """
+    quads = as_quads(quads)
+    repeated = edge_lengths(quads).min(axis=1) < min_edge
+    spans = quads.max(axis=1) - quads.min(axis=1)
+    box_areas = spans[:, 0].astype(np.float64) * spans[:, 1]
+    sliver = np.abs(quad_areas(quads)) <= np.maximum(min_area_ratio * box_areas, 1.0)
+    turns = _turns(quads)
+    concave = ~((turns > 0).all(axis=1) | (turns < 0).all(axis=1))
+
+    problems = []
+    for i in range(len(quads)):
+        if repeated[i]:
+            problems.append("repeated corner")
+        elif sliver[i]:
+            problems.append("near-zero area")
+        elif concave[i]:
+            problems.append("not convex")
+        else:
+            problems.append(None)
+    return problems
+
+
+def _normalizing(points):
+    """(N, 3, 3) similarity transforms moving each point set to its centroid at mean distance sqrt(2)"""
+    center = points.mean(axis=1)
+    spread = np.linalg.norm(points - center[:, None], axis=2).mean(axis=1)
+    scale = np.sqrt(2) / np.maximum(spread, 1e-12)
+    T = np.zeros((len(points), 3, 3))
+    T[:, 0, 0] = T[:, 1, 1] = scale
+    T[:, :2, 2] = -center * scale[:, None]
+    T[:, 2, 2] = 1
+    return T
+
+
+def homographies(src, dst):
+    """(N, 3, 3) perspective transforms taking each src quad's corners onto the dst quad's.
+
+    Same result as cv2.getPerspectiveTransform per quad, solved for all
+    quads in one batched linear solve on normalized coordinates.
+    """
+    src = as_quads(src).astype(np.float64)
+    dst = as_quads(dst).astype(np.float64)
+    n = len(src)
+
+    Ts, Td = _normalizing(src), _normalizing(dst)
+    s = np.einsum("nij,nkj->nki", Ts[:, :2, :2], src) + Ts[:, None, :2, 2]
+    d = np.einsum("nij,nkj->nki", Td[:, :2, :2], dst) + Td[:, None, :2, 2]
+
+    # Two rows per corner of the standard 8 unknown system (h33 = 1)
+    A = np.zeros((n, 8, 8))
+    b = np.zeros((n, 8))
+    x, y, u, v = s[..., 0], s[..., 1], d[..., 0], d[..., 1]
+    A[:, 0::2, 0] = x
+    A[:, 0::2, 1] = y
+    A[:, 0::2, 2] = 1
+    A[:, 0::2, 6] = -x * u
+    A[:, 0::2, 7] = -y * u
+    A[:, 1::2, 3] = x
+    A[:, 1::2, 4] = y
+    A[:, 1::2, 5] = 1
+    A[:, 1::2, 6] = -x * v
+    A[:, 1::2, 7] = -y * v
+    b[:, 0::2] = u
+    b[:, 1::2] = v
+
+    try:
+        h = np.linalg.solve(A, b[..., None])[..., 0]
+    except np.linalg.LinAlgError:
+        # Some quad is degenerate (see quad_problems); least squares still gives an answer
+        h = (np.linalg.pinv(A) @ b[..., None])[..., 0]
+    H = np.concatenate([h, np.ones((n, 1))], axis=1).reshape(n, 3, 3)
+
+    # Undo the normalization and rescale so H[2, 2] is 1, as OpenCV returns it
+    H = np.linalg.inv(Td) @ H @ Ts
+    return H / H[:, 2:3, 2:3]
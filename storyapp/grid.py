@@ -0,0 +1,93 @@
+"""Grid templates for pre-formatted thumbnail sheets.
+
+A template describes a regular grid of frames: rows, columns and the gutters
+between them, placed on the sheet by the four outer corners of the whole
+grid. The corners come either from margins or from clicking the grid's
+outer corners, which also absorbs any skew in a photographed sheet.
+
+Corners are stored as fractions of the sheet's width and height and gutters
+as fractions of the grid's width and height, so a saved template fits any
+scan or upscale width of the same printed sheet.
+"""
+import json
+
+import cv2
+import numpy as np
+
+from storyapp import engine
+
+
+def grid_template(rows, cols, gutter=(0.0, 0.0), margins=(0.0, 0.0, 0.0, 0.0)):
+    """Template for a grid inset from the sheet edges by (left, top, right, bottom) margins"""
+    left, top, right, bottom = margins
+    corners = [[left, top], [1 - right, top], [1 - right, 1 - bottom], [left, 1 - bottom]]
+    return _validated({"rows": rows, "cols": cols, "gutter": list(gutter), "corners": corners})
+
+
+def fit_grid(corners, image_shape, rows, cols, gutter=(0.0, 0.0)):
+    """Template for a grid whose outer corners were picked on an image of the given shape"""
+    height, width = image_shape[:2]
+    corners = engine.sort_corners(np.asarray(corners, dtype=np.float64)) / (width, height)
+    return _validated({"rows": rows, "cols": cols, "gutter": list(gutter),
+                       "corners": corners.tolist()})
+
+
+def _validated(template):
+    rows, cols = int(template["rows"]), int(template["cols"])
+    gx, gy = (float(g) for g in template["gutter"])
+    corners = np.asarray(template["corners"], dtype=np.float64)
+
+    if rows < 1 or cols < 1:
+        raise ValueError("A grid needs at least one row and one column")
+    if gx < 0 or gy < 0 or (cols - 1) * gx >= 1 or (rows - 1) * gy >= 1:
+        raise ValueError("Gutters leave no room for the frames")
+    if corners.shape != (4, 2):
+        raise ValueError("A grid must have exactly four [x, y] outer corners")
+    if cv2.contourArea(corners.astype(np.float32)) <= 0:
+        raise ValueError("The grid's outer corners don't enclose an area")
+
+    return {"rows": rows, "cols": cols, "gutter": [gx, gy], "corners": corners.tolist()}
+
+
+def grid_boxes(template, image_shape):
+    """All frames of a template on an image, as an int32 (rows * cols, 4, 2) array in reading order"""
+    rows, cols = template["rows"], template["cols"]
+    gx, gy = template["gutter"]
+    height, width = image_shape[:2]
+
+    # Frame edges across the unit square, gutters in between
+    cell_w = (1 - (cols - 1) * gx) / cols
+    cell_h = (1 - (rows - 1) * gy) / rows
+    x0 = np.arange(cols) * (cell_w + gx)
+    y0 = np.arange(rows) * (cell_h + gy)
+    x0, y0 = np.meshgrid(x0, y0)  # (rows, cols), row-major is reading order
+    x0, y0 = x0.ravel(), y0.ravel()
+    x1, y1 = x0 + cell_w, y0 + cell_h
+
+    # Corners of every frame, clockwise from top-left
+    unit = np.stack([np.stack([x0, y0], -1), np.stack([x1, y0], -1),
+                     np.stack([x1, y1], -1), np.stack([x0, y1], -1)], axis=1)
+
+    # Map the unit square onto the grid's outer corners on this image
+    square = np.array([[0, 0], [1, 0], [1, 1], [0, 1]], dtype=np.float32)
+    corners = (np.asarray(template["corners"]) * (width, height)).astype(np.float32)
+    H = cv2.getPerspectiveTransform(square, corners)
+    boxes = cv2.perspectiveTransform(unit.reshape(-1, 1, 2), H).reshape(-1, 4, 2)
+
+    return np.round(boxes).astype(np.int32)
+
+
+def save_grid(path, template):
+    """Write a grid template to a JSON file"""
+    with open(path, "w") as f:
+        json.dump(template, f, indent=2)
+
+
+def load_grid(path):
+    """Read a grid template JSON file, raising ValueError if it isn't one"""
+    with open(path) as f:
+        template = json.load(f)
+    try:
+        return _validated(template)
+    except (KeyError, TypeError) as e:
+        raise ValueError(f"{path} is not a grid template: {e}")
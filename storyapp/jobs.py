@@ -0,0 +1,165 @@
+"""Running long image operations off the Tk main thread.
+
+Tk is not thread safe, so a job's worker thread never touches widgets: it
+posts its progress and result to a queue, and the main thread drains the
+queue from a short after() loop and runs the callbacks there. Only one job
+runs at a time, so the GUI can refuse actions that would conflict with it.
+
+Background upkeep the user didn't ask for (such as indexing a sheet's
+corners) goes through run_in_background() instead, which reports back the
+same way but never occupies the job slot or shows progress.
+"""
+import queue
+import threading
+
+# How often the main thread checks a running job for progress, in milliseconds
+POLL_MS = 50
+
+
+class JobCancelled(Exception):
+    """Raised inside a job's work function once the user has cancelled it"""
+
+
+class Job:
+    """Handle passed to a job's work function for progress and cancellation"""
+
+    def __init__(self, name, events, on_done=None, on_error=None, on_cancel=None):
+        self.name = name
+        self._events = events
+        self._cancel = threading.Event()
+        self.callbacks = {"done": on_done, "error": on_error, "cancelled": on_cancel}
+
+    def cancel(self):
+        """Ask the job to stop at its next check_cancelled()"""
+        self._cancel.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def check_cancelled(self):
+        """Raise JobCancelled if the job was cancelled; call this between units of work"""
+        if self._cancel.is_set():
+            raise JobCancelled(self.name)
+
+    def progress(self, done, total, message=None):
+        """Report progress from the worker thread; total=0 means the amount of work is unknown"""
+        self._events.put(("progress", self, (done, total, message)))
+
+
+class JobRunner:
+    """Runs one Job at a time on a worker thread and reports back on the main thread.
+
+    schedule(ms, callback) must queue a callback on the main thread; pass
+    root.after. on_progress(job, done, total, message) and on_state(job) (job
+    is None once it has finished) are called on the main thread too.
+    """
+
+    def __init__(self, schedule, on_progress=None, on_state=None):
+        self.schedule = schedule
+        self.on_progress = on_progress
+        self.on_state = on_state
+        self.job = None
+        self._events = queue.Queue()
+        self._polling = False
+
+    @property
+    def busy(self):
+        return self.job is not None
+
+    def start(self, name, work, on_done=None, on_error=None, on_cancel=None):
+        """Run work(job) on a worker thread; returns the Job, or None if another job is running.
+
+        on_done(result), on_error(exception) and on_cancel() are called on the
+        main thread when the work returns, raises or is cancelled.
+        """
+        if self.job is not None:
+            return None
+
+        job = Job(name, self._events, on_done, on_error, on_cancel)
+        self.job = job
+
+        def run():
+            try:
+                result = work(job)
+            except JobCancelled:
+                self._events.put(("cancelled", job, None))
+            except Exception as e:
+                self._events.put(("error", job, e))
+            else:
+                # A job cancelled during its last, uninterruptible step still counts as cancelled
+                self._events.put(("cancelled" if job.cancelled else "done", job, result))
+
+        threading.Thread(target=run, name=f"storyapp-{name}", daemon=True).start()
+
+        if self.on_state:
+            self.on_state(job)
+        if not self._polling:
+            self._polling = True
+            self.schedule(POLL_MS, self._poll)
+        return job
+
+    def cancel(self):
+        """Cancel the running job, if any"""
+        if self.job is not None:
+            self.job.cancel()
+
+    def _poll(self):
+        while True:
+            try:
+                kind, job, payload = self._events.get_nowait()
+            except queue.Empty:
+                break
+
+            if kind == "progress":
+                if job is self.job and self.on_progress:
+                    self.on_progress(job, *payload)
+                continue
+
+            # The job has finished; clear it first so its callbacks may start the next one
+            if job is self.job:
+                self.job = None
+                if self.on_state:
+                    self.on_state(None)
+
+            callback = job.callbacks[kind]
+            if callback is None:
+                continue
+            if kind == "cancelled":
+                callback()
+            else:
+                callback(payload)
+
+        if self.job is not None:
+            self.schedule(POLL_MS, self._poll)
+        else:
+            self._polling = False
+
+
+def run_in_background(schedule, name, work, on_done=None, on_error=None):
+    """Run work() on a thread of its own, outside any JobRunner.
+
+    on_done(result) or on_error(exception) is called on the main thread
+    once it returns or raises; schedule is root.after, as for JobRunner.
+    There is no progress or cancelling: callers that no longer want the
+    result simply ignore it.
+    """
+    results = queue.Queue()
+
+    def run():
+        try:
+            results.put((on_done, work()))
+        except Exception as e:
+            results.put((on_error, e))
+
+    def poll():
+        try:
+            callback, payload = results.get_nowait()
+        except queue.Empty:
+            schedule(POLL_MS, poll)
+            return
+        if callback is not None:
+            callback(payload)
+
+    threading.Thread(target=run, name=f"storyapp-{name}", daemon=True).start()
+    schedule(POLL_MS, poll)
@@ -0,0 +1,74 @@
+"""Saving and loading panel layouts as JSON.
+
+A layout records the panel quads picked in the GUI (in upscaled sheet
+coordinates) together with the settings needed to reproduce the export, so
+the same selection can be reapplied to other sheets printed from the same
+template.
+"""
+import json
+
+import numpy as np
+
+from storyapp import engine, geometry
+
+
+def make_layout(panels, upscale_width, resolution_mode="1080 tall", adjustments=None):
+    """Build a layout dict from a list of panel boxes"""
+    return {
+        "upscale_width": int(upscale_width),
+        "resolution": resolution_mode,
+        # Adjustment stack applied to each panel region; empty means none
+        "adjustments": [dict(step) for step in adjustments or ()],
+        "panels": [np.asarray(box).astype(int).tolist() for box in panels],
+    }
+
+
+def save_layout(path, layout):
+    """Write a layout dict to a JSON file"""
+    with open(path, "w") as f:
+        json.dump(layout, f, indent=2)
+
+
+def load_layout(path):
+    """Read a layout JSON file, validating the fields the exporter relies on"""
+    with open(path) as f:
+        layout = json.load(f)
+
+    panels = layout.get("panels")
+    if not panels:
+        raise ValueError(f"Layout {path} has no panels")
+    for i, box in enumerate(panels):
+        if np.asarray(box).shape != (4, 2):
+            raise ValueError(f"Panel {i+1} in {path} must have exactly four [x, y] corners")
+    problems = geometry.quad_problems(geometry.canonical_quads(np.asarray(panels, dtype=np.float64)))
+    for i, problem in enumerate(problems):
+        if problem:
+            raise ValueError(f"Panel {i+1} in {path} can't be warped: {problem}")
+
+    resolution_mode = layout.get("resolution", "1080 tall")
+    if resolution_mode not in engine.RESOLUTION_MODES:
+        raise ValueError(f"Unknown resolution setting in {path}: {resolution_mode}")
+
+    layout["resolution"] = resolution_mode
+    layout["upscale_width"] = int(layout.get("upscale_width", engine.DEFAULT_UPSCALE_WIDTH))
+    # Older layouts stored a single adjustment (or null) instead of a stack
+    adjustments = layout.get("adjustments") or []
+    if isinstance(adjustments, dict):
+        adjustments = [adjustments]
+    layout["adjustments"] = adjustments
+    return layout
+
+
+def layout_boxes(layout, upscale_width=None):
+    """Return the layout's panels as int32 boxes, rescaled to another upscale width if given"""
+    scale = 1.0
+    if upscale_width is not None and upscale_width != layout["upscale_width"]:
+        scale = upscale_width / layout["upscale_width"]
+
+    boxes = []
+    for box in layout["panels"]:
+        box = np.asarray(box, dtype=np.float64)
+        if scale != 1.0:
+            box = np.round(box * scale)
+        boxes.append(box.astype(np.int32))
+    return boxes
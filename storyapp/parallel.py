@@ -0,0 +1,121 @@
+"""Warping and writing one sheet's panels on a pool of processes.
+
+The sheet is copied into a multiprocessing.shared_memory block once; each
+worker maps that block when it starts, so a task is just a panel quad and
+an output path, never a pickled copy of a 100+ MB image. Workers adjust,
+warp, encode and write their panel themselves and send back only a small
+thumbnail, so throughput scales with cores rather than with one process's
+OpenCV threads.
+"""
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+from storyapp import engine
+
+# The sheet and export settings, set in each worker process by _attach
+_worker = {}
+
+
+def default_process_workers():
+    """Warp processes to use when none are configured: one per core"""
+    return os.cpu_count() or 1
+
+
+def _pool_context():
+    """Start method for the pool: never fork, which would copy the GUI's threads and Tk state.
+
+    The pool is started from the export thread, and forking a threaded
+    process can leave a worker stuck on a lock some other thread held.
+    """
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("forkserver")
+    return multiprocessing.get_context("spawn")
+
+
+def _open_shared(name):
+    # The parent owns the block; Python 3.13+ can be told not to track it in workers too
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    return shared_memory.SharedMemory(name=name)
+
+
+def _attach(name, shape, dtype, resolution_mode, upscale, adjustments, thumbnail_height):
+    """Worker initializer: map the shared sheet and remember the export settings"""
+    # One OpenCV thread per process; the pool provides the parallelism
+    cv2.setNumThreads(1)
+    shm = _open_shared(name)
+    _worker.update(
+        shm=shm,  # Keep the mapping alive for the life of the worker
+        image=np.ndarray(shape, dtype=dtype, buffer=shm.buf),
+        resolution_mode=resolution_mode,
+        upscale=upscale,
+        adjustments=adjustments,
+        thumbnail_height=thumbnail_height,
+    )
+
+
+def _extract_and_write(filepath, box):
+    """Worker task: adjust, warp, encode and write one panel; returns (ok, thumbnail)"""
+    panel = engine.extract_panel(_worker["image"], box, _worker["resolution_mode"],
+                                 upscale=_worker["upscale"], adjustments=_worker["adjustments"])
+    ok = engine.write_panel(filepath, panel)
+    thumbnail = None
+    if _worker["thumbnail_height"]:
+        thumbnail = engine.thumbnail(panel, _worker["thumbnail_height"])
+    return ok, thumbnail
+
+
+def extract_panels_shared(image, tasks, resolution_mode, upscale=1.0, adjustments=None,
+                          workers=None, thumbnail_height=None, on_written=None,
+                          check_cancelled=None):
+    """Extract and write (filepath, box) tasks from image on a process pool sharing it.
+
+    Same results as extract_panel followed by write_panels. on_written(index,
+    filepath) is called in the calling thread, in task order, and so is
+    check_cancelled(), which may raise to stop the export (panels not yet
+    started are dropped). Returns a list of (filepath, thumbnail) in task
+    order, thumbnails being None unless thumbnail_height is given; raises
+    IOError if a panel can't be written.
+    """
+    tasks = list(tasks)
+    if not tasks:
+        return []
+    workers = max(1, min(workers or default_process_workers(), len(tasks)))
+
+    shm = shared_memory.SharedMemory(create=True, size=max(1, image.nbytes))
+    try:
+        # The only copy of the sheet the export makes
+        shared = np.ndarray(image.shape, dtype=image.dtype, buffer=shm.buf)
+        shared[...] = image
+        del shared
+
+        initargs = (shm.name, image.shape, image.dtype.str, resolution_mode, upscale,
+                    list(adjustments or ()), thumbnail_height)
+        results = []
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=_pool_context(),
+                                   initializer=_attach, initargs=initargs)
+        try:
+            futures = [pool.submit(_extract_and_write, filepath, np.asarray(box))
+                       for filepath, box in tasks]
+            for index, ((filepath, _), future) in enumerate(zip(tasks, futures)):
+                if check_cancelled:
+                    check_cancelled()
+                ok, thumbnail = future.result()
+                if not ok:
+                    raise IOError(f"Failed to write {filepath}")
+                results.append((filepath, thumbnail))
+                if on_written:
+                    on_written(index, filepath)
+        finally:
+            # Drop queued panels if we stopped early; running ones finish before the block goes
+            pool.shutdown(wait=True, cancel_futures=True)
+        return results
+    finally:
+        shm.close()
+        shm.unlink()
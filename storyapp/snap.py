@@ -0,0 +1,130 @@
+"""Snapping clicked corners onto the frame corners drawn on a sheet.
+
+Candidates are found once per sheet (and again after adjusting it) on a
+proxy: the frame-line mask the panel detector uses, whose corners and
+junctions are picked out with the Shi-Tomasi detector. Each candidate is
+then refined at full resolution with cornerSubPix on a small blurred crop,
+where blurring turns a pencil stroke into a ridge so the refined point
+lands on the middle of the lines rather than on one edge of them.
+
+The refined points go into a uniform grid, so finding the candidate
+nearest a click only looks at the few cells within the snap radius.
+"""
+import math
+
+import cv2
+import numpy as np
+
+from storyapp import engine, trace
+from storyapp.detect import line_mask
+
+# Width of the proxy candidates are detected on
+SNAP_WIDTH = 2000
+
+# Most candidates kept per sheet, strongest first
+MAX_CANDIDATES = 3000
+
+# Refinement window half size, in proxy pixels
+REFINE_WINDOW = 8
+
+# Side of a grid cell of the index, in image pixels
+CELL_SIZE = 64
+
+
+@trace.traced("find corners")
+def find_corners(image, adjustments=None, proxy=None, proxy_width=SNAP_WIDTH,
+                 max_corners=MAX_CANDIDATES):
+    """Frame-line corner candidates on a sheet, as a float32 (N, 2) array of full resolution [x, y].
+
+    proxy, if given, is an already downscaled copy of image to detect on
+    (e.g. a display pyramid level); otherwise one proxy_width wide is made.
+    The adjustment stack is applied to the proxy only.
+    """
+    height, width = image.shape[:2]
+    if proxy is None:
+        proxy = engine.shrink_image(image, min(1.0, proxy_width / width))
+    proxy = engine.apply_adjustments(proxy, adjustments)
+    scale_x, scale_y = width / proxy.shape[1], height / proxy.shape[0]
+
+    lines = line_mask(proxy)
+    min_distance = max(3, proxy.shape[1] // 300)
+    corners = cv2.goodFeaturesToTrack(lines, max_corners, qualityLevel=0.05,
+                                      minDistance=min_distance, blockSize=5)
+    if corners is None:
+        return np.empty((0, 2), np.float32)
+
+    # Proxy pixel centers to full resolution coordinates
+    points = (corners.reshape(-1, 2) + 0.5) * (scale_x, scale_y) - 0.5
+    return refine_corners(image, points, max(scale_x, scale_y)).astype(np.float32)
+
+
+def refine_corners(image, points, scale=1.0):
+    """Move each point onto the nearest line corner with sub-pixel accuracy, on crops of image.
+
+    scale is the size of one detection proxy pixel in image pixels; it sets
+    the search window and how much the strokes are blurred. A point the
+    refinement moves out of its window is left where it was.
+    """
+    window = max(3, int(round(REFINE_WINDOW * scale)))
+    sigma = max(1.0, scale / 2)
+    pad = window + int(math.ceil(3 * sigma)) + 1
+    criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 20, 0.05)
+    height, width = image.shape[:2]
+
+    refined = np.array(points, dtype=np.float64)
+    for i, (x, y) in enumerate(refined):
+        x0, y0 = max(0, int(x) - pad), max(0, int(y) - pad)
+        x1, y1 = min(width, int(x) + pad + 1), min(height, int(y) + pad + 1)
+        if x1 - x0 < 2 * window + 3 or y1 - y0 < 2 * window + 3:
+            continue  # Too close to the sheet's edge for a full window
+
+        crop = image[y0:y1, x0:x1]
+        gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if crop.ndim == 3 else crop
+        gray = cv2.GaussianBlur(gray.astype(np.float32), (0, 0), sigma)
+        local = np.array([[[x - x0, y - y0]]], np.float32)
+        cv2.cornerSubPix(gray, local, (window, window), (-1, -1), criteria)
+
+        lx, ly = local[0, 0]
+        if abs(lx - (x - x0)) <= window and abs(ly - (y - y0)) <= window:
+            refined[i] = lx + x0, ly + y0
+    return refined
+
+
+class CornerIndex:
+    """Uniform grid over corner candidates for nearest-point lookups"""
+
+    def __init__(self, points, cell_size=CELL_SIZE):
+        self.points = np.asarray(points, dtype=np.float32).reshape(-1, 2)
+        self.cell_size = cell_size
+        self.cells = {}
+        if len(self.points):
+            keys = np.floor(self.points / cell_size).astype(np.int64)
+            order = np.lexsort((keys[:, 1], keys[:, 0]))
+            keys = keys[order]
+            # Start of each run of points sharing a cell
+            starts = np.flatnonzero(np.r_[True, np.any(keys[1:] != keys[:-1], axis=1)])
+            for start, end in zip(starts, np.r_[starts[1:], len(order)]):
+                self.cells[tuple(keys[start])] = order[start:end]
+
+    def __len__(self):
+        return len(self.points)
+
+    def nearest(self, x, y, radius):
+        """Closest candidate within radius of (x, y) as an (x, y) float pair, or None"""
+        if not self.cells:
+            return None
+        size = self.cell_size
+        cx0, cx1 = math.floor((x - radius) / size), math.floor((x + radius) / size)
+        cy0, cy1 = math.floor((y - radius) / size), math.floor((y + radius) / size)
+
+        found = [self.cells[(cx, cy)] for cx in range(cx0, cx1 + 1) for cy in range(cy0, cy1 + 1)
+                 if (cx, cy) in self.cells]
+        if not found:
+            return None
+        candidates = np.concatenate(found)
+        distances = np.hypot(self.points[candidates, 0] - x, self.points[candidates, 1] - y)
+        best = int(np.argmin(distances))
+        if distances[best] > radius:
+            return None
+        px, py = self.points[candidates[best]]
+        return float(px), float(py)
@@ -0,0 +1,126 @@
+"""Multi-resolution tile pyramid for viewing a sheet at any zoom.
+
+Level 0 is the image itself, not a copy, so a memory-mapped sheet stays on
+disk; each further level halves the one before with area averaging, down to
+one that fits in a single tile. A view reads its tiles from the coarsest
+level that still has at least one pixel per screen pixel, so drawing any
+part of a 15000px sheet at any zoom only touches the handful of tiles on
+screen, and adjustments only run over those.
+"""
+import math
+
+import cv2
+
+from storyapp import engine
+
+# Edge length of a tile in pixels of its level
+TILE_SIZE = 256
+
+# Closest zoom allowed, in screen pixels per image pixel
+MAX_ZOOM = 8.0
+
+
+class TilePyramid:
+    """Downscaled levels of an image, cut into tiles on demand"""
+
+    def __init__(self, image, tile_size=TILE_SIZE):
+        self.tile_size = tile_size
+        self.levels = [image]
+        while max(self.levels[-1].shape[:2]) > tile_size:
+            height, width = self.levels[-1].shape[:2]
+            self.levels.append(cv2.resize(self.levels[-1], ((width + 1) // 2, (height + 1) // 2),
+                                          interpolation=cv2.INTER_AREA))
+
+        # (x, y) size of each level relative to the image, which rounding keeps from being exactly 2^-k
+        height, width = image.shape[:2]
+        self.scales = [(level.shape[1] / width, level.shape[0] / height) for level in self.levels]
+
+    @property
+    def shape(self):
+        return self.levels[0].shape
+
+    def level_for(self, zoom):
+        """Index of the coarsest level with at least one pixel per screen pixel at this zoom"""
+        for k in range(len(self.levels) - 1, 0, -1):
+            if min(self.scales[k]) >= zoom:
+                return k
+        return 0
+
+    def level_near(self, width):
+        """The level whose width is closest to width, by ratio; e.g. a proxy for analysis"""
+        return min(self.levels, key=lambda level: abs(math.log(level.shape[1] / width)))
+
+    def _source_size(self, k, zoom):
+        """Edge of a tile in level pixels: tile_size, or fewer when magnified so it stays tile_size on screen"""
+        if k > 0 or zoom <= 1:
+            return self.tile_size
+        return max(1, int(self.tile_size / zoom))
+
+    def _tile_rect(self, k, tx, ty, size, zoom, offset):
+        """Screen rectangle (left, top, right, bottom) of a tile; neighbours share their edges exactly"""
+        height, width = self.levels[k].shape[:2]
+        sx, sy = self.scales[k]
+        fx, fy = zoom / sx, zoom / sy
+        x0, y0 = tx * size, ty * size
+        x1, y1 = min(x0 + size, width), min(y0 + size, height)
+        ox, oy = offset
+        return (ox + round(x0 * fx), oy + round(y0 * fy), ox + round(x1 * fx), oy + round(y1 * fy))
+
+    def visible_tiles(self, zoom, offset, view_size):
+        """[(key, rect)] of the tiles overlapping a view_size window.
+
+        zoom is screen pixels per image pixel and offset the integer screen
+        position of the image's top-left corner; rects are screen rectangles
+        as from _tile_rect. Keys identify a tile for render(). When magnified,
+        tiles cover fewer image pixels so each stays about tile_size on
+        screen, whatever the zoom.
+        """
+        k = self.level_for(zoom)
+        height, width = self.levels[k].shape[:2]
+        sx, sy = self.scales[k]
+        fx, fy = zoom / sx, zoom / sy
+        size = self._source_size(k, zoom)
+        ox, oy = offset
+        view_width, view_height = view_size
+
+        tx0 = max(0, math.floor(-ox / fx / size))
+        ty0 = max(0, math.floor(-oy / fy / size))
+        tx1 = min(math.ceil(width / size), math.floor((view_width - ox) / fx / size) + 1)
+        ty1 = min(math.ceil(height / size), math.floor((view_height - oy) / fy / size) + 1)
+
+        return [((k, tx, ty, size), self._tile_rect(k, tx, ty, size, zoom, offset))
+                for ty in range(ty0, ty1) for tx in range(tx0, tx1)]
+
+    def render(self, key, zoom, adjustments=None):
+        """RGB pixels of a tile scaled for the screen at this zoom, with the adjustment stack applied"""
+        k, tx, ty, size = key
+        tile = self.levels[k][ty * size:(ty + 1) * size, tx * size:(tx + 1) * size]
+        left, top, right, bottom = self._tile_rect(k, tx, ty, size, zoom, (0, 0))
+        screen_size = (max(1, right - left), max(1, bottom - top))
+
+        if screen_size[0] > tile.shape[1]:
+            # Magnified: adjust the few source pixels, then show them as crisp squares
+            tile = engine.apply_adjustments(tile, adjustments)
+            tile = cv2.resize(tile, screen_size, interpolation=cv2.INTER_NEAREST)
+        else:
+            # Shrunk, as the whole-sheet display proxy always was: downscale, then adjust
+            if screen_size != tile.shape[1::-1]:
+                tile = cv2.resize(tile, screen_size, interpolation=cv2.INTER_AREA)
+            tile = engine.apply_adjustments(tile, adjustments)
+        return engine.to_rgb(tile)
+
+
+def fit_view(image_shape, view_size):
+    """(zoom, offset) showing a whole image centered in a view_size window"""
+    view_width, view_height = view_size
+    zoom = engine.fit_scale(image_shape, view_width, view_height)
+    height, width = image_shape[:2]
+    return zoom, ((view_width - int(width * zoom)) // 2, (view_height - int(height * zoom)) // 2)
+
+
+def zoom_view(zoom, offset, new_zoom, point):
+    """(zoom, offset) after zooming to new_zoom about a screen point, which stays over the same pixel"""
+    px, py = point
+    ox, oy = offset
+    x, y = (px - ox) / zoom, (py - oy) / zoom
+    return new_zoom, (round(px - x * new_zoom), round(py - y * new_zoom))
@@ -0,0 +1,290 @@
+"""Lightweight tracing of the pipeline's stages.
+
+Stages are wrapped in spans:
+
+    with trace.span("warp", panel=3):
+        ...
+
+Tracing is off by default, and then span() hands back one shared context
+manager that does nothing, so instrumented code costs a global lookup and a
+call. Once enable() is called every span records its wall time, the CPU
+time of the process and of its own thread, the change in RSS and, if memory
+tracing was asked for, the change and peak of tracemalloc's traced memory.
+
+Finished spans feed hud_text(), a one-line summary for a status bar, and
+can be saved with dump_chrome_trace() as a Chrome trace JSON file to open in
+chrome://tracing or https://ui.perfetto.dev.
+"""
+import ctypes
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+
+# Finished spans kept for the Chrome trace; the oldest are dropped past this
+MAX_EVENTS = 200000
+
+# How often a HUD should refresh itself from hud_text(), in milliseconds
+HUD_MS = 500
+
+# Stages listed in the HUD, most recently finished first
+HUD_STAGES = 4
+
+# The active Tracer, or None while tracing is off
+_tracer = None
+
+# The tracer most recently disabled, so its spans can still be shown and dumped
+_previous = None
+
+
+class _NullSpan:
+    """What span() returns while tracing is off"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def _statm_rss():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def _windows_rss():
+    class Counters(ctypes.Structure):
+        _fields_ = [("cb", ctypes.c_ulong), ("PageFaultCount", ctypes.c_ulong),
+                    ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                    ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                    ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+
+    counters = Counters()
+    counters.cb = ctypes.sizeof(counters)
+    process = ctypes.windll.kernel32.GetCurrentProcess()
+    if not ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+        return None
+    return counters.WorkingSetSize
+
+
+def _rss_reader():
+    """Function returning this process's resident memory in bytes, or None where that's unknown"""
+    if os.path.exists("/proc/self/statm"):
+        return _statm_rss
+    if os.name == "nt":
+        return _windows_rss
+    return lambda: None
+
+
+class Span:
+    """One timed stage; use through span()"""
+
+    __slots__ = ("tracer", "name", "args", "start", "cpu", "thread_cpu", "rss", "traced")
+
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        tracer = self.tracer
+        self.rss = tracer.rss()
+        self.traced = tracemalloc.get_traced_memory()[0] if tracer.memory else None
+        self.cpu = time.process_time()
+        self.thread_cpu = time.thread_time()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter()
+        thread_cpu = time.thread_time() - self.thread_cpu
+        cpu = time.process_time() - self.cpu
+        tracer = self.tracer
+
+        event = {
+            "name": self.name,
+            "start": self.start - tracer.origin,
+            "wall": end - self.start,
+            "cpu": cpu,
+            "thread_cpu": thread_cpu,
+            "thread": threading.get_ident(),
+            "args": self.args,
+        }
+        rss = tracer.rss()
+        if rss is not None and self.rss is not None:
+            event["rss"] = rss - self.rss
+        if self.traced is not None and tracemalloc.is_tracing():
+            # Peak since tracing started or was last reset, so an upper bound for nested spans
+            current, peak = tracemalloc.get_traced_memory()
+            event["alloc"] = current - self.traced
+            event["alloc_peak"] = peak - self.traced
+        tracer.record(event)
+        return False
+
+
+class Tracer:
+    """Collects finished spans; see enable()"""
+
+    def __init__(self, memory=False):
+        self.origin = time.perf_counter()
+        self.memory = memory
+        self.rss = _rss_reader()
+        self.events = deque(maxlen=MAX_EVENTS)
+        self.thread_names = {}
+        self.lock = threading.Lock()
+        # name -> [count, total wall, last event], in order of the last finish
+        self.stages = {}
+        self.finished = 0
+
+    def span(self, name, args):
+        return Span(self, name, args)
+
+    def record(self, event):
+        thread = threading.current_thread()
+        with self.lock:
+            self.events.append(event)
+            self.thread_names.setdefault(event["thread"], thread.name)
+            count, total, _ = self.stages.pop(event["name"], (0, 0.0, None))
+            self.stages[event["name"]] = [count + 1, total + event["wall"], event]
+            self.finished += 1
+
+
+def enable(memory=False):
+    """Start recording spans, dropping any recorded before.
+
+    memory=True also starts tracemalloc, which slows Python code (not the
+    OpenCV calls) noticeably while it runs.
+    """
+    global _tracer
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    _tracer = Tracer(memory=memory)
+
+
+def disable():
+    """Stop recording spans; the recorded ones stay available until the next enable()"""
+    global _tracer, _previous
+    tracer = _tracer
+    _tracer = None
+    if tracer is not None:
+        _previous = tracer
+        if tracer.memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+
+def enabled():
+    """Whether spans are being recorded"""
+    return _tracer is not None
+
+
+def span(name, **args):
+    """Context manager timing one stage; args are attached to it in the Chrome trace"""
+    tracer = _tracer
+    if tracer is None:
+        return _NULL_SPAN
+    return tracer.span(name, args)
+
+
+def traced(name):
+    """Decorator wrapping every call of a function in a span"""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            tracer = _tracer
+            if tracer is None:
+                return func(*args, **kwargs)
+            with tracer.span(name, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def _current():
+    return _tracer or _previous
+
+
+def finished_count():
+    """Number of spans finished since tracing was enabled; lets a HUD skip redraws"""
+    tracer = _current()
+    return tracer.finished if tracer else 0
+
+
+def _duration(seconds):
+    return f"{seconds * 1000:.0f}ms" if seconds < 1 else f"{seconds:.2f}s"
+
+
+def _megabytes(n):
+    return f"{n / 2**20:+.0f}MB"
+
+
+def hud_text(stages=HUD_STAGES):
+    """One line summing up the most recently finished stages, or "" if there are none.
+
+    Each stage shows its last wall and CPU time and memory change, and how
+    many times it ran with their average if more than once.
+    """
+    tracer = _current()
+    if tracer is None:
+        return ""
+    with tracer.lock:
+        recent = list(tracer.stages.items())[-stages:]
+
+    parts = []
+    for name, (count, total, event) in reversed(recent):
+        text = f"{name} {_duration(event['wall'])} (cpu {_duration(event['cpu'])}"
+        memory = event.get("alloc", event.get("rss"))
+        if memory:
+            text += f", {_megabytes(memory)}"
+        text += ")"
+        if count > 1:
+            text += f" x{count} avg {_duration(total / count)}"
+        parts.append(text)
+    return " | ".join(parts)
+
+
+def chrome_trace():
+    """Recorded spans in Chrome's trace event format, as a dict ready for json.dump"""
+    tracer = _current()
+    if tracer is None:
+        return {"traceEvents": []}
+    with tracer.lock:
+        events = list(tracer.events)
+        thread_names = dict(tracer.thread_names)
+
+    pid = os.getpid()
+    trace_events = [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid,
+                     "args": {"name": name}} for tid, name in thread_names.items()]
+    for event in events:
+        args = dict(event["args"])
+        args["cpu_ms"] = round(event["cpu"] * 1000, 3)
+        args["thread_cpu_ms"] = round(event["thread_cpu"] * 1000, 3)
+        for key in ("rss", "alloc", "alloc_peak"):
+            if key in event:
+                args[key + "_kb"] = event[key] // 1024
+        trace_events.append({
+            "name": event["name"],
+            "cat": "storyapp",
+            "ph": "X",
+            "ts": round(event["start"] * 1e6, 1),
+            "dur": round(event["wall"] * 1e6, 1),
+            "pid": pid,
+            "tid": event["thread"],
+            "args": args,
+        })
+    return {"traceEvents": trace_events, "displayTimeUnit": "ms"}
+
+
+def dump_chrome_trace(path):
+    """Write the recorded spans to a Chrome trace JSON file; returns how many were written"""
+    data = chrome_trace()
+    with open(path, "w") as f:
+        json.dump(data, f, default=str)
+    return sum(1 for event in data["traceEvents"] if event["ph"] == "X")
@@ -1,11 +1,52 @@
-import cv2
 import numpy as np
 import tkinter as tk
-from tkinter import filedialog, simpledialog, Scale, HORIZONTAL, Toplevel
+from tkinter import filedialog, simpledialog, Scale, HORIZONTAL, Toplevel, ttk
 import tkinter.messagebox
 import os
+import bisect
+from collections import OrderedDict
 from PIL import Image, ImageTk
 
+from storyapp import engine, geometry, snap, trace
+from storyapp.detect import detect_panels as find_panel_frames
+from storyapp.export import write_panels, default_write_workers
+from storyapp.grid import grid_template, fit_grid, grid_boxes, save_grid, load_grid
+from storyapp.cache import ImageCache, image_key
+from storyapp.jobs import JobRunner, run_in_background
+from storyapp.parallel import extract_panels_shared
+from storyapp.layout import make_layout, save_layout, load_layout, layout_boxes
+from storyapp.tiles import TilePyramid, MAX_ZOOM, fit_view, zoom_view
+
+# Name of the background job that replaces the preview with the full resolution image.
+# Adjusting and picking panels work on the preview, so they may run alongside it.
+FULL_LOAD_JOB = "loading full resolution"
+
+# Clicks snap to a frame corner within this many screen pixels (hold Ctrl to place freely)
+SNAP_RADIUS = 15
+
+# Height of the exported panel thumbnails shown under the sheet
+PREVIEW_THUMB_HEIGHT = 120
+
+# Preview strip layout: padding inside each thumbnail's frame, space between frames
+# and room for the panel number, in pixels
+PREVIEW_PAD = 5
+PREVIEW_GAP = 10
+PREVIEW_LABEL_HEIGHT = 18
+
+# Thumbnails this many pixels either side of the visible strip are drawn ahead of scrolling
+PREVIEW_OVERSCAN = 400
+
+# Display zoom: factor per mouse wheel step, and most PhotoImages kept for image tiles
+# (each at most TILE_SIZE square on screen at any zoom, so about 64MB in all)
+ZOOM_STEP = 1.25
+TILE_PHOTO_CACHE = 256
+
+# Most PhotoImages the preview strip keeps; the least recently shown off-screen ones go first
+PREVIEW_PHOTO_CACHE = 64
+
+# Set to start the app with stage tracing on (F12 toggles it, Shift+F12 saves a trace)
+TRACE_ENV_VAR = "STORYAPP_TRACE"
+
 class StoryboardExtractor:
     def __init__(self, root):
         self.root = root
@@ -18,19 +59,66 @@ class StoryboardExtractor:
         
         self.image_path = None
         self.original_image = None
-        self.adjusted_image = None
         self.panels = []
-        self.processed_panels = []
+        self.panel_thumbnails = []  # Small copies of the last exported panels, for the previews
+        
+        # Preview strip: left edge of each thumbnail, canvas items of the ones in view
+        # and an LRU of their PhotoImages
+        self.preview_canvas = None
+        self.preview_x = []
+        self.preview_items = {}
+        self.preview_photos = OrderedDict()
+        
+        # Adjustment stack (brightness/contrast/saturation steps). The original image is
+        # never modified: the stack is applied to display proxies and, at export, to
+        # each panel's region only.
+        self.adjustments = []
+        
+        # 600px copy of the original image for the Adjust Image preview, built once per image
+        self.adjust_preview_proxy = None
         
         # Variables for manual selection
         self.selection_mode = False
         self.current_points = []
-        self.selection_image = None
+        
+        # Frame-line corners of the current image (snap.CornerIndex) that clicks snap to
+        self.snap_to_corners = tk.BooleanVar(value=True)
+        self.corner_index = None
+        self.finding_corners = False  # A corner search is running on its own thread
+        
+        # Display: a tile pyramid of the shown image, drawn at display_scale screen pixels
+        # per image pixel with the image's top-left corner at display_offset. Only tiles in
+        # view become PhotoImages, so redraws never touch more than a screenful of pixels.
+        self.display_source = None
+        self.display_tiles = None
+        self.display_scale = 1.0
+        self.display_frame_size = None
+        self.display_offset = (0, 0)
+        self.display_fitted = True  # Refit on resize until the user zooms or pans
+        self.tile_items = {}  # Tile key -> canvas item, for the tiles in view
+        self.tile_photos = OrderedDict()  # LRU of tile PhotoImages by (tile key, zoom)
+        self.pan_anchor = None
+        self.resize_job = None
+        self.highlighted_panel = None
+        
+        # Canvas item ids (outline, number) for each panel in the overlay layer
+        self.panel_items = []
+        
+        # Last values entered in the Grid dialog (gutters and margins in percent)
+        self.grid_settings = {"rows": 3, "cols": 3, "gutter_x": 2.0, "gutter_y": 3.0,
+                              "left": 2.0, "top": 2.0, "right": 2.0, "bottom": 2.0,
+                              "fit": False}
         
         # Variables for image upscaling
-        self.default_upscale_width = 7000  # New default upscale width
+        self.default_upscale_width = engine.DEFAULT_UPSCALE_WIDTH  # New default upscale width
         self.upscale_width = self.default_upscale_width  # Current upscale width
         
+        # Keep the sheet at native resolution and fold the upscale into each panel's warp
+        self.defer_upscale = tk.BooleanVar(value=False)
+        
+        # Back the upscaled sheet with a memory-mapped scratch file instead of RAM
+        self.use_scratch_file = tk.BooleanVar(value=False)
+        
         # Variable for panel resolution setting
         self.resolution_setting = tk.StringVar(value="1080 tall")  # Default resolution setting
         
@@ -41,6 +129,8 @@ class StoryboardExtractor:
         self.remember_export_settings = tk.BooleanVar(value=False)
         self.use_custom_start_number = tk.BooleanVar(value=False)
         self.custom_start_number = tk.IntVar(value=1)
+        self.export_workers = tk.IntVar(value=default_write_workers())  # JPEG encoder threads
+        self.export_processes = tk.BooleanVar(value=False)  # Warp in worker processes sharing the sheet
         
         # Remember last load directory
         self.last_load_dir = ""
@@ -49,9 +139,25 @@ class StoryboardExtractor:
         self.recent_files = []
         self.max_recent_files = 10
         
+        # Decoded and upscaled sheets, so switching between recent files doesn't redo the work
+        self.image_cache = ImageCache()
+        
         # Create UI with new styling
         self.create_ui()
         
+        # Loading, upscaling and exporting run on a worker thread, one job at a time
+        self.jobs = JobRunner(self.root.after, on_progress=self.show_job_progress,
+                              on_state=self.show_job_state)
+        
+        # Stage timings appended to the status bar while tracing is on
+        self.trace_hud_job = None
+        self.trace_hud_text = ""
+        self.trace_hud_count = -1
+        self.root.bind("<F12>", self.toggle_tracing)
+        self.root.bind("<Shift-F12>", self.save_trace)
+        if os.environ.get(TRACE_ENV_VAR):
+            self.toggle_tracing()
+        
     def create_ui(self):
         # Create header frame for logo and title
         header_frame = tk.Frame(self.root, bg="white")
@@ -189,10 +295,10 @@ class StoryboardExtractor:
         # Main display area with improved style
         self.display_frame = tk.Frame(self.root, bd=1, relief="solid", bg="white")
         self.display_frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=(10, 20))
+        self.display_frame.bind("<Configure>", self.on_display_resize)
         
-        # Image display label
-        self.image_label = tk.Label(self.display_frame, bg="white", text="No image loaded")
-        self.image_label.pack(fill=tk.BOTH, expand=True)
+        # Image display canvas
+        self.create_display_canvas("No image loaded")
         
         # Panel preview frame (initially hidden)
         self.preview_frame = tk.Frame(self.root, bg="white")
@@ -202,7 +308,7 @@ class StoryboardExtractor:
         # Status bar
         self.status_var = tk.StringVar()
         self.status_var.set("Load an image to begin")
-        status_bar = tk.Label(
+        self.status_bar = tk.Label(
             self.root, 
             textvariable=self.status_var,
             bd=1,
@@ -211,7 +317,119 @@ class StoryboardExtractor:
             padx=10,
             pady=5
         )
-        status_bar.pack(side="bottom", fill="x")
+        self.status_bar.pack(side="bottom", fill="x")
+        
+        # Progress bar and Cancel button for background jobs (shown only while one runs)
+        self.progress_frame = tk.Frame(self.root, bg="white")
+        self.progress_bar = ttk.Progressbar(self.progress_frame, orient=HORIZONTAL, mode="determinate")
+        self.progress_bar.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(10, 5), pady=5)
+        tk.Button(
+            self.progress_frame,
+            text="Cancel",
+            command=self.cancel_job,
+            bg="#ffcccc",
+            fg="black",
+            font=("Arial", 10, "bold")
+        ).pack(side=tk.LEFT, padx=(5, 10), pady=5)
+    
+    def show_job_state(self, job):
+        """Show the progress bar while a background job runs, hide it when it finishes"""
+        if job is None:
+            self.progress_bar.stop()
+            self.progress_frame.pack_forget()
+            return
+        
+        # Bounce until the job reports how much work it has
+        self.progress_bar.configure(mode="indeterminate", value=0)
+        self.progress_bar.start(15)
+        self.progress_frame.pack(side="bottom", fill="x", after=self.status_bar)
+    
+    def show_job_progress(self, job, done, total, message):
+        """Progress reported by the running job"""
+        if total:
+            if str(self.progress_bar.cget("mode")) != "determinate":
+                self.progress_bar.stop()
+                self.progress_bar.configure(mode="determinate")
+            self.progress_bar.configure(maximum=total, value=done)
+        if message:
+            self.status_var.set(message)
+    
+    def cancel_job(self):
+        """Cancel button: stop the running job at its next checkpoint"""
+        if self.jobs.busy:
+            self.jobs.cancel()
+            self.status_var.set(f"Cancelling ({self.jobs.job.name})...")
+    
+    def refuse_if_busy(self, allow=()):
+        """Return True (and say why) if a background job is running and the action must wait.
+        
+        Jobs named in allow don't conflict with the action.
+        """
+        if not self.jobs.busy or self.jobs.job.name in allow:
+            return False
+        self.status_var.set(f"Please wait for {self.jobs.job.name} to finish, or press Cancel")
+        self.root.bell()
+        return True
+    
+    def report_job_error(self, title, error):
+        """Show a failed background job's error"""
+        print(f"{title}: {error}")
+        tk.messagebox.showerror(title, str(error))
+        self.status_var.set(f"{title}: {error}")
+    
+    def toggle_tracing(self, event=None):
+        """F12: start or stop timing the pipeline's stages, with a summary in the status bar"""
+        if trace.enabled():
+            trace.disable()
+            if self.trace_hud_job is not None:
+                self.root.after_cancel(self.trace_hud_job)
+                self.trace_hud_job = None
+            self.show_trace_hud("")
+            self.status_var.set("Tracing stopped. Press Shift+F12 to save the trace.")
+            return
+        
+        trace.enable(memory=True)
+        self.trace_hud_count = -1
+        self.status_var.set("Tracing on: stage timings show here as they finish. F12 stops, Shift+F12 saves.")
+        self.refresh_trace_hud()
+    
+    def refresh_trace_hud(self):
+        """Update the status bar's stage timings when new spans have finished"""
+        count = trace.finished_count()
+        # Also when a new status message replaced the one the timings were appended to
+        if count != self.trace_hud_count or not self.status_var.get().endswith(self.trace_hud_text):
+            self.trace_hud_count = count
+            self.show_trace_hud(trace.hud_text())
+        self.trace_hud_job = self.root.after(trace.HUD_MS, self.refresh_trace_hud)
+    
+    def show_trace_hud(self, text):
+        """Replace the timings at the end of the status message, keeping the message itself"""
+        message = self.status_var.get()
+        if self.trace_hud_text and message.endswith(self.trace_hud_text):
+            message = message[:-len(self.trace_hud_text)]
+        self.trace_hud_text = f"   [{text}]" if text else ""
+        self.status_var.set(message + self.trace_hud_text)
+    
+    def save_trace(self, event=None):
+        """Shift+F12: write the recorded stage timings as a Chrome trace file"""
+        if not trace.finished_count():
+            self.status_var.set("Nothing traced yet. Press F12 to start tracing.")
+            return
+        
+        path = filedialog.asksaveasfilename(
+            title="Save Trace",
+            defaultextension=".json",
+            filetypes=[("Chrome trace", "*.json"), ("All files", "*.*")],
+            initialfile="storyapp-trace.json"
+        )
+        if not path:
+            return
+        try:
+            count = trace.dump_chrome_trace(path)
+        except OSError as e:
+            tk.messagebox.showerror("Save Trace Failed", str(e))
+            return
+        self.status_var.set(f"Saved {count} spans to {os.path.basename(path)}; open it in chrome://tracing or ui.perfetto.dev")
     
     def show_recent_files_menu(self, event):
         """Show the recent files menu at the mouse position"""
@@ -264,6 +482,9 @@ class StoryboardExtractor:
     
     def load_specific_image(self, file_path):
         """Load a specific image from the recent files list"""
+        if self.refuse_if_busy():
+            return
+            
         if not file_path or not os.path.exists(file_path):
             self.status_var.set(f"File not found: {file_path}")
             # Remove from recent files if it doesn't exist
@@ -271,62 +492,82 @@ class StoryboardExtractor:
                 self.recent_files.remove(file_path)
             return
             
-        # Set the path and trigger the normal load process
-        self.image_path = file_path
+        # Move to the top of recent files and trigger the normal load process
+        self.add_to_recent_files(file_path)
+        self.start_loading(file_path)
+    
+    def start_loading(self, file_path):
+        """Show a quick reduced decode of an image, then load it at full resolution in the background"""
+        self.status_var.set(f"Loading {os.path.basename(file_path)}...")
         
-        try:
-            # Load the image
-            original_img = cv2.imread(self.image_path)
-            if original_img is None:
+        def on_preview(preview):
+            if preview is None:
                 self.status_var.set("Failed to load image")
                 return
-                
-            # Move to the top of recent files
-            self.add_to_recent_files(file_path)
+            
+            # Show the preview straight away; panels can be picked on it while the
+            # full resolution image loads
+            self.finish_loading(file_path, preview)
             
             # Prompt for upscale width
             self.prompt_upscale_width()
-            
-            # Continue with normal loading process
-            height, width = original_img.shape[:2]
-            new_height = int(height * (self.upscale_width / width))
-            
-            self.original_image = cv2.resize(
-                original_img, 
-                (self.upscale_width, new_height), 
-                interpolation=cv2.INTER_CUBIC
-            )
-            
-            self.adjusted_image = self.original_image.copy()
-            self.panels = []
-            self.processed_panels = []
-            
-            # Recreate display frame
-            for widget in self.display_frame.winfo_children():
-                try:
-                    widget.destroy()
-                except tk.TclError:
-                    pass
-                    
-            self.image_label = tk.Label(self.display_frame, bg="white")
-            self.image_label.pack(fill=tk.BOTH, expand=True)
-            
-            self.display_image(self.original_image)
-            self.status_var.set(f"Loaded and upscaled image: {os.path.basename(self.image_path)}")
-            
-            # Hide panel preview frame if it was visible
-            self.preview_frame.pack_forget()
-            
-        except Exception as e:
-            print(f"Error loading specific image: {e}")
-            self.status_var.set(f"Error loading image: {e}")
+            self.load_full_resolution(file_path)
+        
+        self.jobs.start(
+            "loading",
+            lambda job: engine.load_preview(file_path),
+            on_done=on_preview,
+            on_error=lambda e: self.report_job_error("Error loading image", e),
+            on_cancel=lambda: self.status_var.set("Loading cancelled.")
+        )
+    
+    def load_full_resolution(self, file_path):
+        """Decode (and unless deferred, upscale) the full image on the worker thread"""
+        upscale_width = self.upscale_width
+        defer_upscale = self.defer_upscale.get()
+        use_scratch_file = self.use_scratch_file.get()
+        
+        def load(job):
+            key = image_key(file_path, None if defer_upscale else upscale_width)
+            cached = self.image_cache.get(key)
+            if cached is not None:
+                return cached
+                
+            job.progress(0, 2, f"Showing preview; loading {os.path.basename(file_path)} at full resolution...")
+            full_img = engine.load_image(file_path)
+            if full_img is None:
+                raise IOError(f"Failed to decode {file_path}")
+            if not defer_upscale:
+                # Upscale the image to the specified width
+                job.check_cancelled()
+                job.progress(1, 2, f"Showing preview; upscaling image to {upscale_width}px wide...")
+                out = None
+                if use_scratch_file:
+                    # On disk next to the cache, not in a temp directory that may live in RAM
+                    out = engine.scratch_image(engine.upscaled_shape(full_img.shape, upscale_width),
+                                               directory=self.image_cache.cache_dir)
+                full_img = engine.upscale_image(full_img, upscale_width, out=out)
+                
+            self.image_cache.put(key, full_img)
+            return full_img
+        
+        def on_error(e):
+            self.clear_image()
+            self.report_job_error("Error loading image", e)
+        
+        def on_cancel():
+            self.clear_image()
+            self.status_var.set("Loading cancelled.")
+        
+        self.jobs.start(FULL_LOAD_JOB, load, on_done=self.use_full_resolution,
+                        on_error=on_error, on_cancel=on_cancel)
     
     def prompt_upscale_width(self):
         """Prompt the user to enter a custom upscale width with a reset option"""
         # Create a custom dialog
         dialog = Toplevel(self.root)
         dialog.title("Upscale Image")
-        dialog.geometry("300x150")
+        dialog.geometry("300x205")
         dialog.resizable(False, False)
         dialog.transient(self.root)
         dialog.grab_set()  # Make dialog modal
@@ -341,6 +582,14 @@ class StoryboardExtractor:
         entry.select_range(0, tk.END)
         entry.focus_set()
         
+        # Option to skip the upscale here and resample each panel once at export
+        tk.Checkbutton(dialog, text="Keep native resolution (upscale at export)",
+                      variable=self.defer_upscale).pack()
+        
+        # For sheets too big to keep in memory
+        tk.Checkbutton(dialog, text="Keep upscaled image on disk (saves memory)",
+                      variable=self.use_scratch_file).pack()
+        
         # Result variable
         result = [self.upscale_width]  # Using a list to store the result
         
@@ -385,158 +634,385 @@ class StoryboardExtractor:
         # Set the upscale width
         self.upscale_width = result[0]
     
+    def finish_loading(self, file_path, preview):
+        """Show the preview of a freshly loaded image and reset the session"""
+        self.image_path = file_path
+        self.original_image = preview
+        
+        self.adjustments = []
+        self.adjust_preview_proxy = None
+        
+        # Clear any previous display state
+        self.panels = []
+        self.panel_thumbnails = []
+        
+        # Create a new display canvas
+        self.create_display_canvas()
+        
+        # Empty and hide the panel preview strip
+        self.update_panel_previews()
+        
+        # Display the image
+        self.display_image(self.original_image)
+        self.corner_index = None
+    
+    def use_full_resolution(self, working_image):
+        """Swap the preview for the full resolution (and, unless deferred, upscaled) image.
+
+        Panels and corners picked on the preview are rescaled to the new
+        image, so they land on the same spots of the sheet.
+        """
+        preview_height, preview_width = self.original_image.shape[:2]
+        height, width = working_image.shape[:2]
+        scale = np.array([width / preview_width, height / preview_height])
+        
+        for panel in self.panels:
+            panel['box'] = np.round(panel['box'] * scale).astype(np.int32)
+        self.current_points = [(int(round(x * scale[0])), int(round(y * scale[1])))
+                               for x, y in self.current_points]
+        
+        self.original_image = working_image
+        self.adjust_preview_proxy = None
+        # The index holds preview pixel positions; snap again once the full image is indexed
+        self.corner_index = None
+        
+        # Rebuild the display from the full image; the overlays are redrawn at the new scale
+        highlighted = self.highlighted_panel
+        self.display_image(self.original_image)
+        self.set_highlight(highlighted)
+        self.find_frame_corners()
+        
+        name = os.path.basename(self.image_path)
+        if self.defer_upscale.get():
+            self.status_var.set(f"Loaded image: {name} (kept at {width}x{height}; panels are upscaled to {self.upscale_width}px sheet width at export)")
+        else:
+            self.status_var.set(f"Loaded and upscaled image: {name} ({width}x{height})")
+    
+    def find_frame_corners(self):
+        """Index the frame-line corners of the current image for click snapping, in the background.
+
+        The search runs on a thread of its own rather than as a job, so it
+        never holds up loading or exporting; the previous index stays in use
+        until the new one is ready.
+        """
+        if self.display_tiles is None or self.finding_corners:
+            # A running search starts again when it finishes if the sheet changed meanwhile
+            return
+        
+        image = self.original_image
+        adjustments = list(self.adjustments)
+        # A display pyramid level is already about the right size to detect on
+        proxy = self.display_tiles.level_near(snap.SNAP_WIDTH)
+        
+        def find():
+            return snap.CornerIndex(snap.find_corners(image, adjustments, proxy=proxy))
+        
+        def on_done(index):
+            self.finding_corners = False
+            if image is not self.original_image or adjustments != self.adjustments:
+                # The sheet or its adjustments changed meanwhile; index what's there now
+                self.find_frame_corners()
+                return
+            self.corner_index = index
+        
+        def on_error(e):
+            self.finding_corners = False
+            print(f"Finding frame corners failed: {e}")
+        
+        self.finding_corners = True
+        run_in_background(self.root.after, "corners", find, on_done=on_done, on_error=on_error)
+    
+    def export_scale(self):
+        """Factor from working image pixels to upscaled sheet pixels (1.0 unless deferred)"""
+        return self.upscale_width / self.original_image.shape[1]
+    
     def clear_image(self):
         """Completely clears the current image and resets the application state"""
+        if self.refuse_if_busy():
+            return
+            
         # Reset all variables
         self.image_path = None
         self.original_image = None
-        self.adjusted_image = None
+        self.adjustments = []
+        self.adjust_preview_proxy = None
         self.panels = []
-        self.processed_panels = []
-        self.selection_image = None
+        self.panel_thumbnails = []
         self.selection_mode = False
+        self.display_source = None
+        self.display_tiles = None
+        self.tile_photos.clear()
+        self.highlighted_panel = None
+        self.corner_index = None
         
         # Clear any mouse bindings
-        self.image_label.unbind("<Button-1>")
+        self.canvas.unbind("<Button-1>")
         
         # Remove any selection controls if present
         if hasattr(self, 'selection_frame') and self.selection_frame.winfo_exists():
             self.selection_frame.destroy()
         
-        # Recreate the display frame to avoid Tkinter errors
-        for widget in self.display_frame.winfo_children():
-            try:
-                widget.destroy()
-            except tk.TclError:
-                pass  # Ignore errors from already destroyed widgets
+        # Create a new display canvas with no image
+        self.create_display_canvas("No image loaded")
         
-        # Create a new image label with no image
-        self.image_label = tk.Label(self.display_frame, text="No image loaded", bg="white")
-        self.image_label.pack(fill=tk.BOTH, expand=True)
-        
-        # Hide panel preview frame if it was visible
-        self.preview_frame.pack_forget()
+        # Empty and hide the panel preview strip
+        self.update_panel_previews()
                 
         # Update status
         self.status_var.set("Image cleared. Click 'Load Image' to begin.")
     
     def load_image(self):
-        try:
-            # Use the last load directory as the initial directory if available
-            initial_dir = self.last_load_dir if self.last_load_dir else None
-            
-            self.image_path = filedialog.askopenfilename(
-                title="Select Storyboard Image",
-                filetypes=[("Image files", "*.jpg *.jpeg *.png *.bmp")],
-                initialdir=initial_dir
-            )
-            
-            if not self.image_path:
-                return
-            
-            # Remember the directory for next time - store only the directory path
-            self.last_load_dir = os.path.dirname(self.image_path)
-            print(f"Remembered last load directory: {self.last_load_dir}")
-            
-            # Add to recent files list
-            self.add_to_recent_files(self.image_path)
-                
-            # Load the image
-            original_img = cv2.imread(self.image_path)
-            if original_img is None:
-                self.status_var.set("Failed to load image")
-                return
-            
-            # Prompt for upscale width
-            self.prompt_upscale_width()
-            
-            # Upscale the image to the specified width
-            height, width = original_img.shape[:2]
-            new_height = int(height * (self.upscale_width / width))
-            
-            # Upscale using INTER_CUBIC for better quality
-            self.original_image = cv2.resize(
-                original_img, 
-                (self.upscale_width, new_height), 
-                interpolation=cv2.INTER_CUBIC
-            )
-            
-            self.status_var.set(f"Image upscaled to {self.upscale_width}x{new_height}")
-                
-            self.adjusted_image = self.original_image.copy()
-            
-            # Clear any previous display state
-            self.panels = []
-            self.processed_panels = []
-            
-            # Recreate the display frame to avoid errors
-            for widget in self.display_frame.winfo_children():
-                try:
-                    widget.destroy()
-                except tk.TclError:
-                    pass  # Ignore errors from already destroyed widgets
-            
-            # Create a new image label
-            self.image_label = tk.Label(self.display_frame, bg="white")
-            self.image_label.pack(fill=tk.BOTH, expand=True)
-            
-            # Hide panel preview frame if it was visible
-            self.preview_frame.pack_forget()
+        if self.refuse_if_busy():
+            return
             
-            # Display the image
-            self.display_image(self.original_image)
-            self.status_var.set(f"Loaded and upscaled image: {os.path.basename(self.image_path)}")
-        except Exception as e:
-            print(f"Error during image loading: {e}")
-            self.status_var.set("Error loading image. Please try again.")
+        # Use the last load directory as the initial directory if available
+        initial_dir = self.last_load_dir if self.last_load_dir else None
+        
+        file_path = filedialog.askopenfilename(
+            title="Select Storyboard Image",
+            filetypes=[("Image files", "*.jpg *.jpeg *.png *.bmp")],
+            initialdir=initial_dir
+        )
+        
+        if not file_path:
+            return
+        
+        # Remember the directory for next time - store only the directory path
+        self.last_load_dir = os.path.dirname(file_path)
+        print(f"Remembered last load directory: {self.last_load_dir}")
+        
+        # Add to recent files list
+        self.add_to_recent_files(file_path)
+        
+        self.start_loading(file_path)
     
     def display_image(self, img):
-        try:
-            # Convert BGR to RGB
-            rgb_img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-            
-            # Get display frame dimensions
-            frame_width = self.display_frame.winfo_width()
-            frame_height = self.display_frame.winfo_height()
-            
-            if frame_width <= 1 or frame_height <= 1:  # Not yet realized
-                frame_width, frame_height = 800, 600
-            
-            # Resize image to fit the frame
-            img_height, img_width = rgb_img.shape[:2]
-            scale = min(frame_width/img_width, frame_height/img_height)
-            
-            new_width = int(img_width * scale)
-            new_height = int(img_height * scale)
-            
-            resized_img = cv2.resize(rgb_img, (new_width, new_height))
+        """Show a full resolution image, fitted to the frame, building its tile pyramid once"""
+        self.highlighted_panel = None
+        if img is not self.display_source or self.display_tiles is None:
+            # Showing the same image again (e.g. on a new canvas) keeps its pyramid and tiles
+            self.display_source = img
+            with trace.span("display tiles"):
+                self.display_tiles = TilePyramid(img)
+            self.tile_photos.clear()
+        self.fit_display_view()
+        self.redraw_display()
+    
+    def display_view_size(self):
+        """Size of the display area, or a stand-in before it is realized"""
+        frame_width = self.display_frame.winfo_width()
+        frame_height = self.display_frame.winfo_height()
+        
+        if frame_width <= 1 or frame_height <= 1:  # Not yet realized
+            return self.display_frame_size or (800, 600)
+        self.display_frame_size = (frame_width, frame_height)
+        return self.display_frame_size
+    
+    def fit_display_view(self):
+        """Zoom and center the view so the whole image fits the display area"""
+        if self.display_tiles is None:
+            return
+        self.display_scale, self.display_offset = fit_view(self.display_tiles.shape, self.display_view_size())
+        self.display_fitted = True
+    
+    def update_display_adjustments(self):
+        """Show a changed adjustment stack; only the tiles on screen are adjusted again"""
+        if self.display_tiles is None:
+            return
+        self.tile_photos.clear()
+        self.redraw_display()
+    
+    def on_display_resize(self, event):
+        """Refit (or, when zoomed in, refill) the view when the display area changes size"""
+        if self.display_source is None or (event.width, event.height) == self.display_frame_size:
+            return
             
-            # Convert to PhotoImage
-            pil_img = Image.fromarray(resized_img)
-            tk_img = ImageTk.PhotoImage(pil_img)
+        # Wait for the resize to settle before redrawing
+        if self.resize_job is not None:
+            self.root.after_cancel(self.resize_job)
+        self.resize_job = self.root.after(150, self.apply_display_resize)
+    
+    def apply_display_resize(self):
+        self.resize_job = None
+        if self.display_fitted:
+            self.fit_display_view()
+            self.redraw_display()
+        else:
+            self.display_view_size()
+            self.show_visible_tiles()
+    
+    def create_display_canvas(self, text=None):
+        """Recreate the canvas that shows the image tiles with the overlay layer on top"""
+        for widget in self.display_frame.winfo_children():
+            try:
+                widget.destroy()
+            except tk.TclError:
+                pass  # Ignore errors from already destroyed widgets
+                
+        self.canvas = tk.Canvas(self.display_frame, bg="white", highlightthickness=0)
+        self.canvas.pack(fill=tk.BOTH, expand=True)
+        self.panel_items = []
+        self.tile_items = {}
+        
+        if text:
+            self.canvas.create_text(0, 0, text=text, tags="placeholder")
+            self.canvas.bind("<Configure>", lambda e: self.canvas.coords("placeholder", e.width / 2, e.height / 2))
+        
+        # Mouse wheel zooms about the cursor (buttons 4 and 5 on X11), middle-drag pans,
+        # double middle-click fits the whole image again
+        self.canvas.bind("<MouseWheel>", lambda e: self.zoom_display(e, e.delta > 0))
+        self.canvas.bind("<Button-4>", lambda e: self.zoom_display(e, True))
+        self.canvas.bind("<Button-5>", lambda e: self.zoom_display(e, False))
+        self.canvas.bind("<ButtonPress-2>", self.start_pan)
+        self.canvas.bind("<B2-Motion>", self.pan_display)
+        self.canvas.bind("<Double-Button-2>", lambda e: self.reset_display_zoom())
+    
+    def zoom_display(self, event, zoom_in):
+        """Zoom one step in or out, keeping the image pixel under the cursor in place"""
+        if self.display_tiles is None:
+            return
+        fit_zoom = fit_view(self.display_tiles.shape, self.display_view_size())[0]
+        zoom = self.display_scale * (ZOOM_STEP if zoom_in else 1 / ZOOM_STEP)
+        zoom = min(max(zoom, min(fit_zoom, 1.0)), MAX_ZOOM)
+        if zoom == self.display_scale:
+            return
+        
+        self.display_scale, self.display_offset = zoom_view(self.display_scale, self.display_offset,
+                                                            zoom, (event.x, event.y))
+        self.display_fitted = False
+        self.redraw_display()
+    
+    def reset_display_zoom(self):
+        """Fit the whole image in the display area again"""
+        if self.display_tiles is None:
+            return
+        self.fit_display_view()
+        self.redraw_display()
+    
+    def start_pan(self, event):
+        self.pan_anchor = (event.x, event.y)
+    
+    def pan_display(self, event):
+        """Drag the image with the middle button; only newly exposed tiles are drawn"""
+        if self.display_tiles is None or self.pan_anchor is None:
+            return
+        dx, dy = event.x - self.pan_anchor[0], event.y - self.pan_anchor[1]
+        self.pan_anchor = (event.x, event.y)
+        if not dx and not dy:
+            return
+        
+        # Everything on the canvas, tiles and overlays alike, moves with the image
+        self.display_offset = (self.display_offset[0] + dx, self.display_offset[1] + dy)
+        self.display_fitted = False
+        self.canvas.move("all", dx, dy)
+        self.show_visible_tiles()
+    
+    @trace.traced("display refresh")
+    def redraw_display(self):
+        """Draw the image tiles for the current zoom and redraw the overlays over them"""
+        if self.display_tiles is None:
+            return
             
-            # Make sure label exists and is managed by Tkinter
-            if hasattr(self, 'image_label') and self.image_label.winfo_exists():
-                # Update label
-                self.image_label.config(image=tk_img)
-                self.image_label.image = tk_img  # Keep a reference
-            else:
-                # Recreate the label if it doesn't exist
-                self.image_label = tk.Label(self.display_frame, bg="white")
-                self.image_label.pack(fill=tk.BOTH, expand=True)
-                self.image_label.config(image=tk_img)
-                self.image_label.image = tk_img  # Keep a reference
+        try:
+            self.canvas.delete("all")
+            self.tile_items = {}
+            self.show_visible_tiles()
+            self.redraw_overlays()
         except Exception as e:
             print(f"Error displaying image: {e}")
             # Attempt recovery
             try:
-                self.image_label = tk.Label(self.display_frame, bg="white")
-                self.image_label.pack(fill=tk.BOTH, expand=True)
+                self.create_display_canvas()
                 self.status_var.set("Display error. Try resetting the image.")
             except:
                 pass
     
+    def show_visible_tiles(self):
+        """Create the tiles now in view and delete those that left it"""
+        if self.display_tiles is None:
+            return
+        
+        zoom = self.display_scale
+        view_size = self.display_frame_size or (800, 600)
+        visible = dict(self.display_tiles.visible_tiles(zoom, self.display_offset, view_size))
+        
+        for key in [key for key in self.tile_items if key not in visible]:
+            self.canvas.delete(self.tile_items.pop(key))
+        
+        for key, (left, top, _, _) in visible.items():
+            if key in self.tile_items:
+                continue
+            # PhotoImages are kept per zoom, so zooming back out reuses them
+            photo_key = key + (zoom,)
+            photo = self.tile_photos.get(photo_key)
+            if photo is None:
+                pixels = self.display_tiles.render(key, zoom, self.adjustments)
+                photo = ImageTk.PhotoImage(Image.fromarray(pixels))
+                self.tile_photos[photo_key] = photo
+            else:
+                self.tile_photos.move_to_end(photo_key)
+            self.tile_items[key] = self.canvas.create_image(left, top, image=photo, anchor=tk.NW,
+                                                            tags="tile")
+        
+        # Tiles stay under the panel outlines
+        self.canvas.tag_lower("tile")
+        
+        # Let go of the least recently shown PhotoImages, never ones on screen
+        on_screen = {key + (zoom,) for key in self.tile_items}
+        for photo_key in list(self.tile_photos):
+            if len(self.tile_photos) <= TILE_PHOTO_CACHE:
+                break
+            if photo_key not in on_screen:
+                del self.tile_photos[photo_key]
+    
+    def to_canvas(self, x, y):
+        """Map full resolution image coordinates to canvas coordinates"""
+        return (self.display_offset[0] + x * self.display_scale,
+                self.display_offset[1] + y * self.display_scale)
+    
+    def redraw_overlays(self):
+        """Recreate every overlay item, e.g. after the display scale changed"""
+        self.canvas.delete("overlay")
+        self.panel_items = []
+        for i in range(len(self.panels)):
+            self.draw_panel_overlay(i)
+        self.draw_current_selection()
+        self.set_highlight(self.highlighted_panel)
+    
+    def draw_panel_overlay(self, i):
+        """Add the outline and number of one panel to the overlay layer"""
+        box = self.panels[i]['box']
+        coords = [c for x, y in box for c in self.to_canvas(x, y)]
+        outline = self.canvas.create_polygon(coords, outline="#00ff00", fill="", width=2,
+                                             tags=("overlay", "panel"))
+        x, y = coords[0], coords[1]
+        number = self.canvas.create_text(x + 5, y + 5, text=str(i+1), anchor=tk.NW, fill="red",
+                                         font=("Arial", 16, "bold"), tags=("overlay", "panel"))
+        self.panel_items.append((outline, number))
+    
+    def remove_panel_overlay(self, i):
+        """Delete one panel's overlay items and renumber the ones after it"""
+        for item in self.panel_items.pop(i):
+            self.canvas.delete(item)
+        for j in range(i, len(self.panel_items)):
+            self.canvas.itemconfig(self.panel_items[j][1], text=str(j+1))
+        if self.highlighted_panel == i:
+            self.highlighted_panel = None
+        elif self.highlighted_panel is not None and self.highlighted_panel > i:
+            self.highlighted_panel -= 1
+    
+    def set_highlight(self, panel_index):
+        """Show one panel's outline in thick red, the others in green"""
+        if self.highlighted_panel is not None and self.highlighted_panel < len(self.panel_items):
+            self.canvas.itemconfig(self.panel_items[self.highlighted_panel][0], outline="#00ff00", width=2)
+        self.highlighted_panel = panel_index
+        if panel_index is not None and panel_index < len(self.panel_items):
+            self.canvas.itemconfig(self.panel_items[panel_index][0], outline="red", width=4)
+    
     def show_adjust_panel(self):
+        if self.refuse_if_busy(allow=(FULL_LOAD_JOB,)):
+            return
+            
         if self.original_image is None:
             self.status_var.set("Please load an image first")
             return
@@ -554,48 +1030,53 @@ class StoryboardExtractor:
         preview_label = tk.Label(preview_frame)
         preview_label.pack()
         
-        # Variables for sliders
-        brightness_var = tk.IntVar(value=0)
-        contrast_var = tk.DoubleVar(value=1.0)
-        saturation_var = tk.DoubleVar(value=1.0)
+        # Variables for sliders, starting from the current adjustment
+        current = self.adjustments[-1] if self.adjustments else engine.adjustment_step(0, 1.0, 1.0)
+        brightness_var = tk.IntVar(value=current["brightness"])
+        contrast_var = tk.DoubleVar(value=current["contrast"])
+        saturation_var = tk.DoubleVar(value=current["saturation"])
+        
+        # Resize for preview (smaller for the dialog), once per loaded image
+        if self.adjust_preview_proxy is None:
+            preview_width = 600
+            self.adjust_preview_proxy = engine.shrink_image(self.original_image,
+                                                            preview_width / self.original_image.shape[1])
+        # Keep using this proxy even if the full resolution image arrives while the dialog is open
+        preview_proxy = self.adjust_preview_proxy
+        
+        # Pending preview update, so slider drags coalesce into one redraw per idle
+        pending_update = [None]
         
         # Function to update preview
         def update_preview():
+            pending_update[0] = None
+            if not preview_label.winfo_exists():  # Dialog closed before the redraw ran
+                return
+            
             # Get values
             brightness = brightness_var.get()
             contrast = contrast_var.get()
             saturation = saturation_var.get()
             
-            # Create a copy to work with
-            temp_img = self.original_image.copy()
-            
-            # Apply saturation
-            hsv = cv2.cvtColor(temp_img, cv2.COLOR_BGR2HSV).astype(np.float32)
-            hsv[:, :, 1] = hsv[:, :, 1] * saturation
-            hsv[:, :, 1] = np.clip(hsv[:, :, 1], 0, 255)
-            temp_img = cv2.cvtColor(hsv.astype(np.uint8), cv2.COLOR_HSV2BGR)
-            
-            # Apply brightness and contrast
-            temp_img = cv2.convertScaleAbs(temp_img, alpha=contrast, beta=brightness)
+            # Apply saturation, brightness and contrast to the small proxy only;
+            # the full resolution image is processed once, on Apply
+            temp_img = engine.adjust_image(preview_proxy, brightness, contrast, saturation)
             
             # Convert to RGB for display
-            rgb_img = cv2.cvtColor(temp_img, cv2.COLOR_BGR2RGB)
-            
-            # Resize for preview (smaller for the dialog)
-            h, w = rgb_img.shape[:2]
-            preview_width = 600
-            preview_height = int(h * (preview_width / w))
-            
-            resized = cv2.resize(rgb_img, (preview_width, preview_height))
+            rgb_img = engine.to_rgb(temp_img)
             
             # Convert to PhotoImage
-            pil_img = Image.fromarray(resized)
+            pil_img = Image.fromarray(rgb_img)
             tk_img = ImageTk.PhotoImage(pil_img)
             
             # Update preview label
             preview_label.config(image=tk_img)
             preview_label.image = tk_img  # Keep reference
         
+        def schedule_preview(value=None):
+            if pending_update[0] is None:
+                pending_update[0] = adjust_window.after_idle(update_preview)
+        
         # Sliders frame
         sliders_frame = tk.Frame(adjust_window)
         sliders_frame.pack(pady=10, fill=tk.X, padx=20)
@@ -603,23 +1084,20 @@ class StoryboardExtractor:
         # Brightness slider
         tk.Label(sliders_frame, text="Brightness:").pack(anchor=tk.W)
         brightness_slider = Scale(sliders_frame, from_=-100, to=100, orient=HORIZONTAL, 
-                    variable=brightness_var, length=600)
+                    variable=brightness_var, length=600, command=schedule_preview)
         brightness_slider.pack(fill=tk.X)
-        brightness_slider.bind("<ButtonRelease-1>", lambda e: update_preview())
         
         # Contrast slider
         tk.Label(sliders_frame, text="Contrast:").pack(anchor=tk.W)
         contrast_slider = Scale(sliders_frame, from_=0.5, to=2.0, orient=HORIZONTAL, 
-                    resolution=0.1, variable=contrast_var, length=600)
+                    resolution=0.1, variable=contrast_var, length=600, command=schedule_preview)
         contrast_slider.pack(fill=tk.X)
-        contrast_slider.bind("<ButtonRelease-1>", lambda e: update_preview())
         
         # Saturation slider
         tk.Label(sliders_frame, text="Saturation:").pack(anchor=tk.W)
         saturation_slider = Scale(sliders_frame, from_=0.0, to=2.0, orient=HORIZONTAL, 
-                    resolution=0.1, variable=saturation_var, length=600)
+                    resolution=0.1, variable=saturation_var, length=600, command=schedule_preview)
         saturation_slider.pack(fill=tk.X)
-        saturation_slider.bind("<ButtonRelease-1>", lambda e: update_preview())
         
         # Buttons frame
         button_frame = tk.Frame(adjust_window)
@@ -632,20 +1110,13 @@ class StoryboardExtractor:
             contrast = contrast_var.get()
             saturation = saturation_var.get()
             
-            # Apply adjustments to the main image
-            temp_img = self.original_image.copy()
-            
-            # Apply saturation
-            hsv = cv2.cvtColor(temp_img, cv2.COLOR_BGR2HSV).astype(np.float32)
-            hsv[:, :, 1] = hsv[:, :, 1] * saturation
-            hsv[:, :, 1] = np.clip(hsv[:, :, 1], 0, 255)
-            temp_img = cv2.cvtColor(hsv.astype(np.uint8), cv2.COLOR_HSV2BGR)
-            
-            # Apply brightness and contrast
-            self.adjusted_image = cv2.convertScaleAbs(temp_img, alpha=contrast, beta=brightness)
+            # Store the adjustment on the session; the full resolution image is left
+            # alone and only panel regions are adjusted at export
+            self.adjustments = [engine.adjustment_step(brightness, contrast, saturation)]
             
             # Display the adjusted image in main window
-            self.display_image(self.adjusted_image)
+            self.update_display_adjustments()
+            self.find_frame_corners()
             self.status_var.set("Image adjusted. Proceed to detect panels.")
             adjust_window.destroy()
         
@@ -668,13 +1139,16 @@ class StoryboardExtractor:
         update_preview()
     
     def detect_panels(self):
-        if self.adjusted_image is None:
+        if self.refuse_if_busy(allow=(FULL_LOAD_JOB,)):
+            return
+            
+        if self.original_image is None:
             self.status_var.set("Please load and adjust an image first")
             return
         
         # First, ensure we clean up any existing selection mode
         self.selection_mode = False
-        self.image_label.unbind("<Button-1>")
+        self.canvas.unbind("<Button-1>")
         
         # Remove any existing selection controls before creating new ones
         if hasattr(self, 'selection_frame') and self.selection_frame.winfo_exists():
@@ -684,22 +1158,11 @@ class StoryboardExtractor:
         self.panels = []
         self.current_points = []
         
-        # Make a copy of the image for drawing
-        self.selection_image = self.adjusted_image.copy()
-        
         # Clear previous content and recreate display area
-        for widget in self.display_frame.winfo_children():
-            try:
-                widget.destroy()
-            except tk.TclError:
-                pass
-                
-        # Create a new image label
-        self.image_label = tk.Label(self.display_frame, bg="white")
-        self.image_label.pack(fill=tk.BOTH, expand=True)
+        self.create_display_canvas()
         
         # Display the image for selection
-        self.display_image(self.selection_image)
+        self.display_image(self.original_image)
         self.status_var.set("Preparing panel detection mode...")
         
         # Force the UI to update and stabilize
@@ -712,8 +1175,9 @@ class StoryboardExtractor:
         self.root.after(300)  # 300ms delay
         self.root.update()
         
-        # Display the image again to ensure it's positioned correctly
-        self.display_image(self.selection_image)
+        # Refit the image now that the controls have taken their space
+        self.fit_display_view()
+        self.redraw_display()
         
         # Another forced update and delay
         self.root.update_idletasks()
@@ -724,11 +1188,36 @@ class StoryboardExtractor:
         self.selection_mode = True
         
         # Setup mouse callbacks
-        self.image_label.bind("<Button-1>", self.on_click)
-        self.image_label.bind("<Button-3>", lambda event: self.finish_selection())  # Right-click to finish selection
+        self.canvas.bind("<Button-1>", self.on_click)
+        self.canvas.bind("<Shift-Button-1>", self.remove_panel_at)  # Shift-click to remove a panel
+        self.canvas.bind("<Button-3>", lambda event: self.finish_selection())  # Right-click to finish selection
         
-        # Add instructional text with emphasis on CLOCKWISE selection
-        self.status_var.set("Click on corners CLOCKWISE to detect panel: top-left, top-right, bottom-right, bottom-left. Right-click when done.")
+        # Find the thumbnail frames automatically; clicks can still add or fix panels
+        self.auto_detect_panels()
+    
+    def auto_detect_panels(self):
+        """Fill the panel list with the frames found on the adjusted image"""
+        if self.refuse_if_busy(allow=(FULL_LOAD_JOB,)):
+            return
+            
+        if self.original_image is None:
+            self.status_var.set("Please load and adjust an image first")
+            return
+            
+        self.status_var.set("Detecting panels...")
+        self.root.update_idletasks()
+        
+        boxes = find_panel_frames(self.original_image, adjustments=self.adjustments)
+        
+        self.panels = [{'box': box, 'index': i} for i, box in enumerate(boxes)]
+        self.current_points = []
+        self.redraw_overlays()
+        
+        if self.panels:
+            self.status_var.set(f"Detected {len(self.panels)} panels. Shift-click a panel to remove it, click corners CLOCKWISE to add one. Scroll to zoom in for precise corners. Right-click when done.")
+        else:
+            # Add instructional text with emphasis on CLOCKWISE selection
+            self.status_var.set("No panels detected. Click on corners CLOCKWISE to detect panel: top-left, top-right, bottom-right, bottom-left. Scroll to zoom in for precise corners. Right-click when done.")
     
     def add_selection_controls(self):
         # Create a frame for panel selection controls with improved styling
@@ -777,8 +1266,51 @@ class StoryboardExtractor:
             font=("Arial", 10, "bold")
         ).pack(side=tk.LEFT, padx=5)
         
+        tk.Button(
+            buttons_frame, 
+            text="Save Layout", 
+            command=self.save_layout,
+            bg="#f0f0f0",
+            fg="black",
+            font=("Arial", 10, "bold")
+        ).pack(side=tk.LEFT, padx=5)
+        
+        tk.Button(
+            buttons_frame, 
+            text="Load Layout", 
+            command=self.load_layout,
+            bg="#f0f0f0",
+            fg="black",
+            font=("Arial", 10, "bold")
+        ).pack(side=tk.LEFT, padx=5)
+        
+        tk.Button(
+            buttons_frame, 
+            text="Auto Detect", 
+            command=self.auto_detect_panels,
+            bg="#f0f0f0",
+            fg="black",
+            font=("Arial", 10, "bold")
+        ).pack(side=tk.LEFT, padx=5)
+        
+        tk.Button(
+            buttons_frame, 
+            text="Grid...", 
+            command=self.show_grid_dialog,
+            bg="#f0f0f0",
+            fg="black",
+            font=("Arial", 10, "bold")
+        ).pack(side=tk.LEFT, padx=5)
+        
         # Removed "Finish Selection" button as requested
         
+        tk.Checkbutton(
+            buttons_frame,
+            text="Snap to corners",
+            variable=self.snap_to_corners,
+            bg=self.LIGHT_BROWN
+        ).pack(side=tk.LEFT, padx=5)
+        
         # Resolution settings - right side
         resolution_frame = tk.Frame(self.selection_frame, bg=self.LIGHT_BROWN)
         resolution_frame.pack(side=tk.RIGHT, padx=10)
@@ -803,30 +1335,15 @@ class StoryboardExtractor:
         if not self.selection_mode:
             return
             
-        # Get display frame dimensions
-        frame_width = self.display_frame.winfo_width()
-        frame_height = self.display_frame.winfo_height()
-        
-        # Get image dimensions
-        img_height, img_width = self.adjusted_image.shape[:2]
-        
-        # Calculate scale
-        scale = min(frame_width/img_width, frame_height/img_height)
-        
-        # Calculate offset if the image is centered
-        new_width = int(img_width * scale)
-        new_height = int(img_height * scale)
+        x, y = self.event_to_image_coords(event)
         
-        offset_x = (frame_width - new_width) // 2
-        offset_y = (frame_height - new_height) // 2
-        
-        # Calculate actual position in original image
-        x = int((event.x - offset_x) / scale)
-        y = int((event.y - offset_y) / scale)
-        
-        # Ensure coordinates are within image bounds
-        x = max(0, min(x, img_width - 1))
-        y = max(0, min(y, img_height - 1))
+        # Snap to the nearest frame corner on screen unless Ctrl is held
+        if self.snap_to_corners.get() and self.corner_index is not None and not event.state & 0x0004:
+            corner = self.corner_index.nearest(x, y, SNAP_RADIUS / self.display_scale)
+            if corner is not None:
+                img_height, img_width = self.original_image.shape[:2]
+                x = min(max(int(round(corner[0])), 0), img_width - 1)
+                y = min(max(int(round(corner[1])), 0), img_height - 1)
         
         # Add the point to current selection
         self.current_points.append((x, y))
@@ -844,37 +1361,63 @@ class StoryboardExtractor:
             if next_corner < 4:
                 self.status_var.set(f"Now click on the {corner_names[next_corner]} corner of the panel (CLOCKWISE selection)")
     
-    def draw_current_selection(self):
-        # Make a copy of the working image
-        display_img = self.selection_image.copy()
+    def remove_panel_at(self, event):
+        """Remove the panel under the mouse, e.g. a false detection"""
+        if not self.selection_mode:
+            return
+            
+        x, y = self.event_to_image_coords(event)
         
-        # Draw existing panels
-        for i, panel in enumerate(self.panels):
-            cv2.drawContours(display_img, [panel['box']], 0, (0, 255, 0), 2)
-            x, y = panel['box'][0]
-            # Use much larger font size (150% larger) and bolder
-            cv2.putText(display_img, str(i+1), (x+10, y+40), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 7.5, (0, 0, 255), 8)
+        hits = []
+        if self.panels:
+            hits = np.flatnonzero(geometry.quads_containing([panel['box'] for panel in self.panels], x, y))
+        if len(hits) == 0:
+            self.status_var.set("No panel under the cursor to remove.")
+            return
+            
+        # Remove the top-most (last drawn) panel under the cursor
+        i = int(hits[-1])
+        self.panels.pop(i)
+        for j, panel in enumerate(self.panels):
+            panel['index'] = j
+            
+        self.remove_panel_overlay(i)
+        self.status_var.set(f"Panel {i+1} removed. {len(self.panels)} panels remaining.")
+    
+    def event_to_image_coords(self, event):
+        """Map a mouse event on the displayed image to full resolution image coordinates"""
+        # Get image dimensions
+        img_height, img_width = self.original_image.shape[:2]
         
-        # Draw current points
-        for i, point in enumerate(self.current_points):
-            cv2.circle(display_img, point, 8, (0, 0, 255), -1)
-            cv2.putText(display_img, str(i+1), (point[0]+15, point[1]+15), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 1.5, (0, 0, 255), 2)
+        # Calculate actual position in original image
+        offset_x, offset_y = self.display_offset
+        x = int((self.canvas.canvasx(event.x) - offset_x) / self.display_scale)
+        y = int((self.canvas.canvasy(event.y) - offset_y) / self.display_scale)
+        
+        # Ensure coordinates are within image bounds
+        x = max(0, min(x, img_width - 1))
+        y = max(0, min(y, img_height - 1))
+        
+        return x, y
+    
+    def draw_current_selection(self):
+        # Replace the current selection items; existing panels stay untouched
+        self.canvas.delete("current")
+        points = [self.to_canvas(x, y) for x, y in self.current_points]
         
         # Draw lines between points
-        if len(self.current_points) >= 2:
-            for i in range(len(self.current_points) - 1):
-                cv2.line(display_img, self.current_points[i], self.current_points[i+1], 
-                         (255, 0, 0), 2)
-                
+        if len(points) >= 2:
             # If 3 or more points, connect to form a polygon
-            if len(self.current_points) >= 3:
-                cv2.line(display_img, self.current_points[-1], self.current_points[0], 
-                         (255, 0, 0), 2)
+            line = points + [points[0]] if len(points) >= 3 else points
+            self.canvas.create_line([c for point in line for c in point], fill="blue",
+                                    tags=("overlay", "current"))
         
-        # Display the updated image
-        self.display_image(display_img)
+        # Draw current points
+        for i, (x, y) in enumerate(points):
+            self.canvas.create_oval(x - 4, y - 4, x + 4, y + 4, fill="red", outline="",
+                                    tags=("overlay", "current"))
+            self.canvas.create_text(x + 8, y + 8, text=str(i+1), anchor=tk.NW, fill="red",
+                                    tags=("overlay", "current"))
     
     def add_panel(self):
         # Convert points to numpy array
@@ -886,22 +1429,19 @@ class StoryboardExtractor:
             'index': len(self.panels)
         })
         
-        # Update the selection image with the new panel
-        self.selection_image = self.adjusted_image.copy()
-        for i, panel in enumerate(self.panels):
-            cv2.drawContours(self.selection_image, [panel['box']], 0, (0, 255, 0), 2)
-            x, y = panel['box'][0]
-            # Use much larger font size (300% larger) and bolder
-            cv2.putText(self.selection_image, str(i+1), (x+10, y+40), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 7.5, (0, 0, 255), 8)
-        
         # Reset current points
         self.current_points = []
         
-        # Display the updated image
-        self.display_image(self.selection_image)
+        # Add just the new panel to the overlay
+        self.draw_panel_overlay(len(self.panels) - 1)
+        self.draw_current_selection()
         
         self.status_var.set(f"Panel {len(self.panels)} added. Click CLOCKWISE to define the next panel or click 'Finish Selection' when done.")
+        
+        # Warn straight away about quads that can't be warped, e.g. three clicks completed with a repeated corner
+        problem = geometry.quad_problems(geometry.canonical_quads(box))[0]
+        if problem:
+            self.status_var.set(f"Panel {len(self.panels)} added, but it can't be exported ({problem}). Delete it and click its corners again.")
     
     def complete_panel(self):
         # Force complete the current panel if we have at least 3 points
@@ -918,8 +1458,8 @@ class StoryboardExtractor:
         # Clear current points
         self.current_points = []
         
-        # Redraw the image
-        self.display_image(self.selection_image)
+        # Redraw the current selection
+        self.draw_current_selection()
         
         self.status_var.set("Current selection reset. Click CLOCKWISE to start defining a new panel.")
     
@@ -938,11 +1478,8 @@ class StoryboardExtractor:
         self.panels = []
         self.current_points = []
         
-        # Reset the selection image to the adjusted image
-        self.selection_image = self.adjusted_image.copy()
-        
-        # Display the updated image
-        self.display_image(self.selection_image)
+        # Remove the outlines
+        self.redraw_overlays()
         
         self.status_var.set("All panels cleared. Click CLOCKWISE to start defining new panels.")
     
@@ -951,20 +1488,196 @@ class StoryboardExtractor:
             # Remove the last panel
             self.panels.pop()
             
-            # Update the selection image
-            self.selection_image = self.adjusted_image.copy()
-            for i, panel in enumerate(self.panels):
-                cv2.drawContours(self.selection_image, [panel['box']], 0, (0, 255, 0), 2)
-                x, y = panel['box'][0]
-                # Use much larger font size (150% larger) and bolder
-                cv2.putText(self.selection_image, str(i+1), (x+10, y+40), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 3.75, (0, 0, 255), 4)
-            
-            # Display the updated image
-            self.display_image(self.selection_image)
+            # Remove its outline
+            self.remove_panel_overlay(len(self.panels))
             
             self.status_var.set(f"Last panel deleted. {len(self.panels)} panels remaining.")
     
+    def save_layout(self):
+        """Save the selected panels and export settings for headless batch extraction"""
+        if not self.panels:
+            self.status_var.set("No panels to save. Define panels first.")
+            return
+            
+        path = filedialog.asksaveasfilename(
+            title="Save Panel Layout",
+            defaultextension=".json",
+            filetypes=[("Layout files", "*.json")],
+            initialdir=self.last_load_dir if self.last_load_dir else None
+        )
+        if not path:
+            return
+        
+        # Layouts are stored in upscaled sheet coordinates
+        scale = self.export_scale()
+        layout = make_layout(
+            [np.round(panel['box'] * scale) for panel in self.panels],
+            self.upscale_width,
+            self.resolution_setting.get(),
+            self.adjustments
+        )
+        try:
+            save_layout(path, layout)
+        except OSError as e:
+            tk.messagebox.showerror("Save Layout", f"Could not save layout: {e}")
+            return
+            
+        self.status_var.set(f"Saved layout with {len(self.panels)} panels to {os.path.basename(path)}")
+    
+    def load_layout(self):
+        """Replace the current panels with the ones from a saved layout"""
+        if self.refuse_if_busy(allow=(FULL_LOAD_JOB,)):
+            return
+            
+        path = filedialog.askopenfilename(
+            title="Load Panel Layout",
+            filetypes=[("Layout files", "*.json")],
+            initialdir=self.last_load_dir if self.last_load_dir else None
+        )
+        if not path:
+            return
+            
+        try:
+            layout = load_layout(path)
+        except (OSError, ValueError) as e:
+            tk.messagebox.showerror("Load Layout", f"Could not load layout: {e}")
+            return
+        
+        # Rescale the quads if this sheet was upscaled to a different width (or kept native)
+        boxes = layout_boxes(layout, self.original_image.shape[1])
+        self.panels = [{'box': box, 'index': i} for i, box in enumerate(boxes)]
+        self.current_points = []
+        self.resolution_setting.set(layout["resolution"])
+        
+        self.redraw_overlays()
+        self.status_var.set(f"Loaded {len(self.panels)} panels from {os.path.basename(path)}")
+    
+    def apply_grid(self, template, source):
+        """Replace the current panels with every frame of a grid template"""
+        boxes = grid_boxes(template, self.original_image.shape)
+        self.panels = [{'box': box, 'index': i} for i, box in enumerate(boxes)]
+        self.current_points = []
+        
+        self.redraw_overlays()
+        self.status_var.set(f"{source}: {template['rows']}x{template['cols']} grid, {len(self.panels)} panels. Shift-click a panel to remove it.")
+    
+    def show_grid_dialog(self):
+        """Fill the panels from a regular grid, set up by margins, by the grid's outer corners or from a template"""
+        if self.refuse_if_busy(allow=(FULL_LOAD_JOB,)):
+            return
+            
+        if self.original_image is None:
+            self.status_var.set("Please load an image first")
+            return
+        
+        dialog = Toplevel(self.root)
+        dialog.title("Grid Template")
+        dialog.geometry("380x380")
+        dialog.resizable(False, False)
+        dialog.transient(self.root)
+        dialog.grab_set()  # Make dialog modal
+        
+        main_frame = tk.Frame(dialog, padx=15, pady=15, bg=self.LIGHT_BROWN)
+        main_frame.pack(fill=tk.BOTH, expand=True)
+        
+        settings = self.grid_settings
+        fields = {}
+        
+        def add_field(row, label, key, to):
+            tk.Label(main_frame, text=label, bg=self.LIGHT_BROWN, fg=self.BROWN).grid(row=row, column=0, sticky=tk.W, pady=2)
+            var = tk.StringVar(value=str(settings[key]))
+            tk.Spinbox(main_frame, from_=0, to=to, increment=1 if key in ("rows", "cols") else 0.5,
+                       textvariable=var, width=8).grid(row=row, column=1, sticky=tk.W, pady=2)
+            fields[key] = var
+        
+        add_field(0, "Rows:", "rows", 50)
+        add_field(1, "Columns:", "cols", 50)
+        add_field(2, "Gutter across (% of grid width):", "gutter_x", 20)
+        add_field(3, "Gutter down (% of grid height):", "gutter_y", 20)
+        add_field(4, "Left margin (% of sheet):", "left", 45)
+        add_field(5, "Top margin (% of sheet):", "top", 45)
+        add_field(6, "Right margin (% of sheet):", "right", 45)
+        add_field(7, "Bottom margin (% of sheet):", "bottom", 45)
+        
+        # Instead of margins, use a panel clicked on the grid's four outer corners
+        fit_var = tk.BooleanVar(value=settings["fit"] and bool(self.panels))
+        tk.Checkbutton(main_frame, text="Fit to the last panel (click the grid's\nouter corners as a panel first)",
+                       variable=fit_var, bg=self.LIGHT_BROWN, justify=tk.LEFT,
+                       state=tk.NORMAL if self.panels else tk.DISABLED).grid(row=8, column=0, columnspan=2, sticky=tk.W, pady=(10, 0))
+        
+        def read_template():
+            """Template from the dialog's fields, or None after reporting what's wrong"""
+            try:
+                values = {key: float(var.get()) for key, var in fields.items()}
+                values["rows"], values["cols"] = int(values["rows"]), int(values["cols"])
+                gutter = (values["gutter_x"] / 100, values["gutter_y"] / 100)
+                if fit_var.get():
+                    template = fit_grid(self.panels[-1]['box'], self.original_image.shape,
+                                        values["rows"], values["cols"], gutter)
+                else:
+                    margins = tuple(values[key] / 100 for key in ("left", "top", "right", "bottom"))
+                    template = grid_template(values["rows"], values["cols"], gutter, margins)
+            except ValueError as e:
+                tk.messagebox.showerror("Grid Template", f"Invalid grid: {e}", parent=dialog)
+                return None
+            
+            values["fit"] = fit_var.get()
+            self.grid_settings = values
+            return template
+        
+        def on_apply():
+            template = read_template()
+            if template is not None:
+                dialog.destroy()
+                self.apply_grid(template, "Grid applied")
+        
+        def on_save():
+            template = read_template()
+            if template is None:
+                return
+            path = filedialog.asksaveasfilename(
+                parent=dialog,
+                title="Save Grid Template",
+                defaultextension=".json",
+                filetypes=[("Grid templates", "*.json")],
+                initialdir=self.last_load_dir if self.last_load_dir else None
+            )
+            if not path:
+                return
+            try:
+                save_grid(path, template)
+            except OSError as e:
+                tk.messagebox.showerror("Save Grid Template", f"Could not save template: {e}", parent=dialog)
+                return
+            self.status_var.set(f"Saved grid template to {os.path.basename(path)}")
+        
+        def on_load():
+            path = filedialog.askopenfilename(
+                parent=dialog,
+                title="Load Grid Template",
+                filetypes=[("Grid templates", "*.json")],
+                initialdir=self.last_load_dir if self.last_load_dir else None
+            )
+            if not path:
+                return
+            try:
+                template = load_grid(path)
+            except (OSError, ValueError) as e:
+                tk.messagebox.showerror("Load Grid Template", f"Could not load template: {e}", parent=dialog)
+                return
+            dialog.destroy()
+            self.apply_grid(template, f"Loaded {os.path.basename(path)}")
+        
+        button_frame = tk.Frame(main_frame, bg=self.LIGHT_BROWN)
+        button_frame.grid(row=9, column=0, columnspan=2, pady=(15, 0))
+        
+        for text, command in (("Apply", on_apply), ("Save Template...", on_save),
+                              ("Load Template...", on_load), ("Cancel", dialog.destroy)):
+            tk.Button(button_frame, text=text, command=command,
+                     bg="#f0f0f0", fg="black", font=("Arial", 10, "bold" if text == "Apply" else "normal")).pack(side=tk.LEFT, padx=3)
+        
+        dialog.bind("<Return>", lambda event: on_apply())
+    
     def finish_selection(self):
         # Complete the current panel if there are points
         if self.current_points:
@@ -974,7 +1687,7 @@ class StoryboardExtractor:
         self.selection_mode = False
         
         # Remove the mouse callback
-        self.image_label.unbind("<Button-1>")
+        self.canvas.unbind("<Button-1>")
         
         # Remove the selection controls
         if hasattr(self, 'selection_frame'):
@@ -989,13 +1702,20 @@ class StoryboardExtractor:
             self.status_var.set("No panels were defined. Click 'Detect Panels' to try again.")
     
     def update_panel_previews(self):
-        """Create and display thumbnails of all panels"""
+        """Show the exported panels' thumbnails in a scrollable strip under the sheet.
+        
+        Only the thumbnails scrolled into view get canvas items and a PhotoImage,
+        so a sheet with a hundred panels costs no more to show than one with ten.
+        """
         # Clear previous thumbnails
         for widget in self.preview_frame.winfo_children():
             widget.destroy()
+        self.preview_canvas = None
+        self.preview_items = {}
+        self.preview_photos.clear()
             
-        # Skip if no processed panels
-        if not self.processed_panels:
+        # Skip if no panels were exported
+        if not self.panel_thumbnails:
             self.preview_frame.pack_forget()
             return
             
@@ -1012,82 +1732,107 @@ class StoryboardExtractor:
             fg=self.BROWN
         ).pack(anchor=tk.W, padx=10, pady=(10, 5))
         
-        # Create a frame for the thumbnails
-        thumbs_frame = tk.Frame(self.preview_frame, bg="white")
-        thumbs_frame.pack(fill=tk.X, pady=5, padx=10)
-        
-        # Calculate thumbnail size (max 120px height)
-        max_height = 120
-        
-        # Create thumbnails for each panel
-        for i, panel in enumerate(self.processed_panels):
-            # Create frame for this thumbnail
-            thumb_frame = tk.Frame(
-                thumbs_frame, 
-                bd=2, 
-                relief=tk.GROOVE, 
-                padx=5, 
-                pady=5,
-                bg=self.LIGHT_BROWN
-            )
-            thumb_frame.pack(side=tk.LEFT, padx=5, pady=5)
-            
-            # Calculate thumbnail size
-            h, w = panel.shape[:2]
-            scale = max_height / h
-            thumb_width = int(w * scale)
-            thumb_height = max_height
-            
-            # Resize to thumbnail size
-            thumb = cv2.resize(panel, (thumb_width, thumb_height))
-            
-            # Convert to tkinter image
-            rgb_thumb = cv2.cvtColor(thumb, cv2.COLOR_BGR2RGB)
-            pil_img = Image.fromarray(rgb_thumb)
-            tk_img = ImageTk.PhotoImage(pil_img)
-            
-            # Create image label
-            img_label = tk.Label(thumb_frame, image=tk_img)
-            img_label.image = tk_img  # Keep reference
-            img_label.pack()
-            
-            # Add panel number label with styling
-            tk.Label(
-                thumb_frame, 
-                text=f"Panel {i+1}",
-                bg=self.LIGHT_BROWN,
-                fg=self.BROWN,
-                font=("Arial", 9, "bold")
-            ).pack()
-            
-            # Store the index to use in the event handler
-            img_label.panel_index = i
-            
-            # Add click event to highlight corresponding panel in main view
-            img_label.bind("<Button-1>", self.highlight_panel)
+        # Left edge of every thumbnail slot; only these numbers exist for panels out of view
+        self.preview_x = []
+        x = 0
+        for thumb in self.panel_thumbnails:
+            self.preview_x.append(x)
+            x += thumb.shape[1] + 2 * PREVIEW_PAD + PREVIEW_GAP
+        
+        canvas = tk.Canvas(self.preview_frame, bg="white", highlightthickness=0,
+                           height=PREVIEW_THUMB_HEIGHT + 2 * PREVIEW_PAD + PREVIEW_LABEL_HEIGHT,
+                           scrollregion=(0, 0, max(1, x - PREVIEW_GAP), 0))
+        scrollbar = tk.Scrollbar(self.preview_frame, orient=HORIZONTAL, command=canvas.xview)
+        
+        def on_scrolled(first, last):
+            scrollbar.set(first, last)
+            self.show_visible_previews()
+        
+        canvas.configure(xscrollcommand=on_scrolled)
+        canvas.pack(fill=tk.X, padx=10, pady=(5, 0))
+        scrollbar.pack(fill=tk.X, padx=10, pady=(0, 5))
+        
+        # Scroll the strip with the mouse wheel (Windows/macOS) or buttons 4 and 5 (X11)
+        canvas.bind("<MouseWheel>", lambda e: canvas.xview_scroll(-1 if e.delta > 0 else 1, "units"))
+        canvas.bind("<Button-4>", lambda e: canvas.xview_scroll(-1, "units"))
+        canvas.bind("<Button-5>", lambda e: canvas.xview_scroll(1, "units"))
+        canvas.configure(xscrollincrement=PREVIEW_THUMB_HEIGHT)
+        
+        # Click a thumbnail to highlight its panel in the main view
+        canvas.bind("<Button-1>", self.on_preview_click)
+        canvas.bind("<Configure>", lambda e: self.show_visible_previews())
+        
+        self.preview_canvas = canvas
+        self.show_visible_previews()
     
-    def highlight_panel(self, event):
-        """Highlight the selected panel in the main view"""
-        # Get the panel index from the clicked label
-        panel_index = event.widget.panel_index
+    def show_visible_previews(self):
+        """Create the thumbnails scrolled into view and delete the ones scrolled out"""
+        canvas = self.preview_canvas
+        if canvas is None:
+            return
         
+        left = canvas.canvasx(0)
+        right = left + max(canvas.winfo_width(), 1)
+        first = max(0, bisect.bisect_right(self.preview_x, left - PREVIEW_OVERSCAN) - 1)
+        last = bisect.bisect_left(self.preview_x, right + PREVIEW_OVERSCAN)
+        visible = range(first, last)
+        
+        for i in [i for i in self.preview_items if i not in visible]:
+            canvas.delete(f"preview{i}")
+            del self.preview_items[i]
+        
+        for i in visible:
+            if i not in self.preview_items:
+                self.draw_preview(i)
+        
+        # Let go of PhotoImages beyond the cache size, never ones still on screen
+        for i in list(self.preview_photos):
+            if len(self.preview_photos) <= PREVIEW_PHOTO_CACHE:
+                break
+            if i not in self.preview_items:
+                del self.preview_photos[i]
+    
+    def preview_photo(self, i):
+        """PhotoImage of panel i's thumbnail, from the LRU cache or made now"""
+        photo = self.preview_photos.get(i)
+        if photo is None:
+            photo = ImageTk.PhotoImage(Image.fromarray(engine.to_rgb(self.panel_thumbnails[i])))
+            self.preview_photos[i] = photo
+        else:
+            self.preview_photos.move_to_end(i)
+        return photo
+    
+    def draw_preview(self, i):
+        """Create the canvas items of panel i's thumbnail: frame, image and number"""
+        canvas = self.preview_canvas
+        x = self.preview_x[i]
+        width = self.panel_thumbnails[i].shape[1] + 2 * PREVIEW_PAD
+        height = PREVIEW_THUMB_HEIGHT + 2 * PREVIEW_PAD + PREVIEW_LABEL_HEIGHT
+        tag = f"preview{i}"
+        
+        self.preview_items[i] = (
+            canvas.create_rectangle(x, 0, x + width - 1, height - 1, fill=self.LIGHT_BROWN,
+                                    outline=self.BROWN, tags=tag),
+            canvas.create_image(x + PREVIEW_PAD, PREVIEW_PAD, image=self.preview_photo(i),
+                                anchor=tk.NW, tags=tag),
+            canvas.create_text(x + width / 2, height - PREVIEW_LABEL_HEIGHT / 2 - PREVIEW_PAD / 2,
+                               text=f"Panel {i+1}", fill=self.BROWN,
+                               font=("Arial", 9, "bold"), tags=tag),
+        )
+    
+    def on_preview_click(self, event):
+        """Highlight the panel whose thumbnail was clicked"""
+        x = self.preview_canvas.canvasx(event.x)
+        i = bisect.bisect_right(self.preview_x, x) - 1
+        if i < 0 or x > self.preview_x[i] + self.panel_thumbnails[i].shape[1] + 2 * PREVIEW_PAD:
+            return  # In a gap between thumbnails
+        self.highlight_panel(i)
+    
+    def highlight_panel(self, panel_index):
+        """Highlight the selected panel in the main view"""
         if panel_index < len(self.panels):
-            # Create a copy of the adjusted image for highlighting
-            display_img = self.adjusted_image.copy()
-            
-            # Draw all panels
-            for i, panel in enumerate(self.panels):
-                # Determine color - highlighted panel in red, others in green
-                color = (0, 0, 255) if i == panel_index else (0, 255, 0)
-                thickness = 8 if i == panel_index else 4
-                
-                cv2.drawContours(display_img, [panel['box']], 0, color, thickness)
-                x, y = panel['box'][0]
-                cv2.putText(display_img, str(i+1), (x+10, y+40), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 7.5, color, 8)
-            
-            # Display the image with highlighted panel
-            self.display_image(display_img)
+            # Highlighted panel in red, others in green
+            self.set_highlight(panel_index)
             self.status_var.set(f"Panel {panel_index+1} highlighted")
     
     def show_export_dialog(self):
@@ -1099,7 +1844,7 @@ class StoryboardExtractor:
         # Create dialog with styling
         dialog = Toplevel(self.root)
         dialog.title("Export Panels")
-        dialog.geometry("500x400")
+        dialog.geometry("500x450")
         dialog.resizable(False, False)
         dialog.transient(self.root)
         dialog.grab_set()  # Make dialog modal
@@ -1212,6 +1957,25 @@ class StoryboardExtractor:
         if self.use_custom_start_number.get():
             start_num_container.pack(side=tk.LEFT)
         
+        # Number of threads encoding and writing panels in parallel
+        workers_frame = tk.Frame(main_frame, bg=self.LIGHT_BROWN)
+        workers_frame.pack(fill=tk.X, pady=(0, 15))
+        
+        tk.Label(workers_frame, text="Encoder threads:", width=18, anchor=tk.W,
+               bg=self.LIGHT_BROWN, fg=self.BROWN).pack(side=tk.LEFT)
+        
+        tk.Spinbox(
+            workers_frame, 
+            from_=1, 
+            to=max(32, default_write_workers()), 
+            textvariable=self.export_workers, 
+            width=6
+        ).pack(side=tk.LEFT)
+        
+        # Run the whole warp, encode and write on that many processes instead
+        tk.Checkbutton(workers_frame, text="Use processes (more cores)",
+                      variable=self.export_processes, bg=self.LIGHT_BROWN).pack(side=tk.LEFT, padx=(10, 0))
+        
         # Numbering options
         numbering_frame = tk.Frame(main_frame, bg=self.LIGHT_BROWN)
         numbering_frame.pack(fill=tk.X, pady=(0, 15))
@@ -1312,6 +2076,9 @@ class StoryboardExtractor:
             
     def convert_and_export_panels(self):
         """Combined function to convert panels and export them in one step"""
+        if self.refuse_if_busy():
+            return
+            
         if not self.panels:
             self.status_var.set("Please detect panels first")
             return
@@ -1321,159 +2088,127 @@ class StoryboardExtractor:
         if self.selection_mode and self.current_points:
             self.complete_panel()
         
+        # Check every quad before any pixels are warped
+        quads = geometry.canonical_quads(np.array([panel['box'] for panel in self.panels]))
+        bad = [(i, problem) for i, problem in enumerate(geometry.quad_problems(quads)) if problem]
+        if bad:
+            listing = "\n".join(f"Panel {i+1}: {problem}" for i, problem in bad)
+            if len(bad) == len(self.panels):
+                tk.messagebox.showerror("Invalid Panels", f"None of the panels can be exported:\n{listing}")
+                self.status_var.set("No valid panels to export.")
+                return
+            if not tk.messagebox.askyesno("Invalid Panels", f"These panels can't be exported:\n{listing}\n\nSkip them and export the rest?"):
+                self.status_var.set("Export cancelled. Fix or remove the flagged panels.")
+                return
+            skipped = {i for i, _ in bad}
+            self.panels = [panel for i, panel in enumerate(self.panels) if i not in skipped]
+            for i, panel in enumerate(self.panels):
+                panel['index'] = i
+            self.redraw_overlays()
+        
         # End selection mode
         self.selection_mode = False
         
         # Remove the mouse callback
-        self.image_label.unbind("<Button-1>")
+        self.canvas.unbind("<Button-1>")
         
         # Remove the selection controls
         if hasattr(self, 'selection_frame') and self.selection_frame.winfo_exists():
             self.selection_frame.destroy()
         
-        # Process panels first (converting them to perfect rectangles)
-        self.status_var.set("Converting panels to perfect rectangles...")
-        self.root.update_idletasks()  # Update UI to show status
-        
-        # Process all panels
-        self.processed_panels = []
-        
-        for panel in self.panels:
-            # Get the four corners
-            src_points = panel['box'].astype(np.float32)
-            
-            # Sort corners: top-left, top-right, bottom-right, bottom-left
-            def sort_corners(pts):
-                # Calculate center
-                center = np.mean(pts, axis=0)
-                
-                # Function to calculate angle from center
-                def get_angle(point):
-                    return np.arctan2(point[1] - center[1], point[0] - center[0])
-                
-                # Sort corners by angle
-                sorted_pts = sorted(pts, key=lambda p: get_angle(p))
-                
-                # Rearrange to start from top-left (smallest sum of coords)
-                top_left_idx = np.argmin([p[0] + p[1] for p in sorted_pts])
-                sorted_pts = np.roll(sorted_pts, -top_left_idx, axis=0)
-                
-                return sorted_pts
-            
-            src_points = sort_corners(src_points)
-            
-            # Calculate width and height while maintaining the original panel dimensions
-            # Calculate average width and height from the source points
-            width = int((np.linalg.norm(src_points[1] - src_points[0]) + 
-                         np.linalg.norm(src_points[3] - src_points[2])) / 2)
-            height = int((np.linalg.norm(src_points[2] - src_points[1]) + 
-                          np.linalg.norm(src_points[0] - src_points[3])) / 2)
-            
-            # Round height up to the nearest 100 pixels
-            height = int(np.ceil(height / 100.0) * 100)
-            
-            # Define destination points for a perfect rectangle
-            dst_points = np.array([
-                [0, 0],               # top-left
-                [width-1, 0],         # top-right
-                [width-1, height-1],  # bottom-right
-                [0, height-1]         # bottom-left
-            ], dtype=np.float32)
-            
-            # Calculate perspective transform
-            M = cv2.getPerspectiveTransform(src_points, dst_points)
-            
-            # Apply transform to create perfect rectangle while maintaining resolution
-            warped = cv2.warpPerspective(self.adjusted_image, M, (width, height))
-            
-            # Apply resolution setting if needed
-            resolution_mode = self.resolution_setting.get()
-            if resolution_mode != "auto":
-                panel_height, panel_width = warped.shape[:2]
-                
-                if resolution_mode == "1080 tall":
-                    # Scale to 1080px height
-                    scale_factor = 1080 / panel_height
-                    new_width = int(panel_width * scale_factor)
-                    warped = cv2.resize(warped, (new_width, 1080), interpolation=cv2.INTER_CUBIC)
-                    
-                elif resolution_mode == "1920 wide":
-                    # Scale to 1920px width
-                    scale_factor = 1920 / panel_width
-                    new_height = int(panel_height * scale_factor)
-                    warped = cv2.resize(warped, (1920, new_height), interpolation=cv2.INTER_CUBIC)
-            
-            # Store processed panel
-            self.processed_panels.append(warped)
-        
-        # Update panel previews
-        self.update_panel_previews()
-        
-        # Show enhanced export dialog
+        # Ask where the panels go first, so each one can be written as soon as it is converted
         base_name, directory, numbering_mode, start_number = self.show_export_dialog()
         
         if not base_name or not directory:
             self.status_var.set("Export cancelled.")
             return
         
-        # Export panels
-        self.status_var.set("Exporting panels...")
-        self.root.update_idletasks()  # Update UI to show status
-        
         # Use the explicit start number from the dialog if in overwrite mode
         # For continue mode, find the highest existing number
-        if numbering_mode == "overwrite":
-            start_number = start_number  # Use the value from the dialog
-        else:  # continue mode
-            # Get all files matching the base name pattern
-            existing_files = [f for f in os.listdir(directory) 
-                             if f.startswith(base_name) and f.endswith(".jpg")]
+        start_number = engine.export_start_number(directory, base_name, numbering_mode, start_number)
+        
+        # Encode and save the images on a pool of threads (or processes)
+        try:
+            workers = self.export_workers.get()
+        except tk.TclError:  # Spinbox left empty or non-numeric
+            workers = default_write_workers()
+        
+        # Everything the worker thread reads is captured here on the main thread
+        image = self.original_image
+        boxes = [panel['box'] for panel in self.panels]
+        resolution_mode = self.resolution_setting.get()
+        upscale = self.export_scale()
+        adjustments = list(self.adjustments)
+        thumbnails = []
+        
+        use_processes = self.export_processes.get()
+        
+        @trace.traced("export")
+        def export(job):
+            def report_written(index, filepath):
+                job.progress(index + 1, len(boxes),
+                             f"Exported panel {index+1} of {len(boxes)}: {os.path.basename(filepath)}")
+            
+            if use_processes:
+                # Worker processes map the sheet from shared memory and write the panels themselves
+                tasks = [(os.path.join(directory, engine.panel_filename(base_name, start_number + i)), box)
+                         for i, box in enumerate(boxes)]
+                results = extract_panels_shared(image, tasks, resolution_mode, upscale=upscale,
+                                                adjustments=adjustments, workers=workers,
+                                                thumbnail_height=PREVIEW_THUMB_HEIGHT,
+                                                on_written=report_written,
+                                                check_cancelled=job.check_cancelled)
+                thumbnails.extend(thumbnail for _, thumbnail in results)
+                return [filepath for filepath, _ in results]
+            
+            # Convert each panel to a perfect rectangle only when the writer is ready for it;
+            # once written, only its thumbnail is kept
+            def items():
+                for i, box in enumerate(boxes):
+                    job.check_cancelled()
+                    
+                    # Adjust just this panel's region, warp it to a perfect rectangle
+                    # and apply the resolution setting
+                    panel = engine.extract_panel(image, box, resolution_mode,
+                                                 upscale=upscale, adjustments=adjustments)
+                    thumbnails.append(engine.thumbnail(panel, PREVIEW_THUMB_HEIGHT))
+                    
+                    # Format filenames with padded numbers (starting from the determined number)
+                    yield os.path.join(directory, engine.panel_filename(base_name, start_number + i)), panel
             
-            # Extract numbers from existing files
-            existing_numbers = []
-            for filename in existing_files:
-                # Try to extract number from filename (e.g., panel_001.jpg -> 1)
-                number_part = filename[len(base_name):-4]  # Remove base_name and .jpg
-                try:
-                    existing_numbers.append(int(number_part))
-                except ValueError:
-                    # If conversion fails, just skip this file
-                    pass
+            return write_panels(items(), workers=workers, on_written=report_written)
+        
+        def show_thumbnails():
+            self.panel_thumbnails = thumbnails
             
-            # Set start number to one more than the highest existing number
-            if existing_numbers:
-                start_number = max(existing_numbers) + 1
-            # Otherwise use the value from the dialog
-        
-        for i, panel in enumerate(self.processed_panels):
-            # Format filename with padded number (starting from the determined number)
-            panel_number = start_number + i
-            filename = f"{base_name}{panel_number:03d}.jpg"
-            filepath = os.path.join(directory, filename)
+            # Update panel previews
+            self.update_panel_previews()
+        
+        def on_exported(written):
+            show_thumbnails()
+            end_number = start_number + len(written) - 1
             
-            # Save the image
-            cv2.imwrite(filepath, panel, [cv2.IMWRITE_JPEG_QUALITY, 95])
+            # Update status message with export details and resolution
+            if numbering_mode == "continue":
+                self.status_var.set(f"Exported {len(written)} panels to {directory} with {resolution_mode} resolution (panels {start_number:03d}-{end_number:03d})")
+            else:
+                self.status_var.set(f"Exported {len(written)} panels to {directory} with {resolution_mode} resolution")
+            
+            # Show the panel outlines without a highlight to show we're done
+            self.set_highlight(None)
         
-        end_number = start_number + len(self.processed_panels) - 1
+        def on_error(e):
+            show_thumbnails()
+            self.report_job_error("Export Failed", e)
         
-        # Get current resolution setting
-        resolution_mode = self.resolution_setting.get()
+        def on_cancel():
+            show_thumbnails()
+            self.status_var.set("Export cancelled; panels already written were kept.")
         
-        # Update status message with export details and resolution
-        if numbering_mode == "continue":
-            self.status_var.set(f"Exported {len(self.processed_panels)} panels to {directory} with {resolution_mode} resolution (panels {start_number:03d}-{end_number:03d})")
-        else:
-            self.status_var.set(f"Exported {len(self.processed_panels)} panels to {directory} with {resolution_mode} resolution")
-        
-        # Display the original image with panel outlines to show we're done
-        display_img = self.adjusted_image.copy()
-        for i, panel in enumerate(self.panels):
-            cv2.drawContours(display_img, [panel['box']], 0, (0, 255, 0), 2)
-            x, y = panel['box'][0]
-            cv2.putText(display_img, str(i+1), (x+10, y+40), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 3.75, (0, 0, 255), 4)
-                       
-        self.display_image(display_img)
+        # Export panels
+        self.status_var.set("Exporting panels...")
+        self.jobs.start("exporting panels", export, on_done=on_exported,
+                        on_error=on_error, on_cancel=on_cancel)
 
 # Run the application
 if __name__ == "__main__":